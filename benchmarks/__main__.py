@@ -0,0 +1,207 @@
+"""
+Benchmark harness for the meeting room services.
+
+Examples::
+
+    python -m benchmarks list
+    python -m benchmarks run --service rooms --concurrency 8 --duration 10 --output results.json
+    python -m benchmarks run --scenario list_rooms --url http://localhost:4000 --baseline baseline.json
+    python -m benchmarks replay traffic.jsonl --concurrency 4 --loops 3
+    python -m benchmarks replay traffic.jsonl --url rooms=http://localhost:4000 --url bookings=http://localhost:5003 \
+        --url reviews=http://localhost:5004
+
+Without ``--url`` requests go through each service's Flask test client in
+this process, so no server is needed. A bare ``--url`` serves a single
+service; runs that touch several services need one ``--url SERVICE=URL``
+per service.
+"""
+import argparse
+import cProfile
+import json
+import pstats
+import sys
+
+from benchmarks.report import SUMMARY_HEADER, build_report, compare, format_summary, save_report, summarize
+from benchmarks.runner import HttpTarget, InProcessTarget, ReplaySource, run_load
+from benchmarks.scenarios import SCENARIOS
+
+SERVICES = ['rooms', 'bookings', 'reviews', 'users']
+
+
+def parse_urls(values):
+    """
+    Reads the ``--url`` options.
+
+    :param values: ``URL`` or ``SERVICE=URL`` strings.
+    :type values: list
+    :return: Service to base URL. A bare URL is stored under None.
+    :rtype: dict
+    """
+    urls = {}
+    for value in values or []:
+        service, separator, url = value.partition('=')
+        if separator and service in SERVICES:
+            urls[service] = url
+        else:
+            urls[None] = value
+    return urls
+
+def check_urls(urls, services):
+    """
+    Exits unless every service of a run has a server address.
+
+    A bare URL is only accepted for a single service: the load balancer, for
+    one, only fronts rooms, so the other services' requests would go to the
+    wrong host.
+
+    :param urls: Result of :func:`parse_urls`, empty to run in process.
+    :type urls: dict
+    :param services: Services the run sends requests to.
+    :type services: set
+    """
+    if not urls:
+        return
+    if None in urls and len(services) > 1:
+        sys.exit(f"A bare --url serves one service, but this run uses {', '.join(sorted(services))}. "
+                 "Pass --url SERVICE=URL for each of them.")
+    missing = sorted(service for service in services if service not in urls and None not in urls)
+    if missing:
+        sys.exit(f"No --url SERVICE=URL for: {', '.join(missing)}")
+
+def target_factory(urls, default_service):
+    """
+    Returns a function choosing the target of each request, creating targets once.
+
+    :param urls: Service to base URL of a running server (None for any service), empty to run in process.
+    :type urls: dict
+    :param default_service: Service of requests that do not name one.
+    :type default_service: str
+    :return: ``spec -> target``.
+    :rtype: callable
+    """
+    targets = {}
+
+    def target_for(spec):
+        service = spec.get('service', default_service)
+        if service not in targets:
+            url = urls.get(service, urls.get(None))
+            targets[service] = HttpTarget(url) if url else InProcessTarget(service)
+        return targets[service]
+    return target_for
+
+def selected_scenarios(args):
+    if args.scenario:
+        unknown = [name for name in args.scenario if name not in SCENARIOS]
+        if unknown:
+            sys.exit(f"Unknown scenario(s): {', '.join(unknown)}")
+        return [SCENARIOS[name] for name in args.scenario]
+    return [s for s in SCENARIOS.values() if not args.service or s.service in args.service]
+
+def run_scenarios(args):
+    results = {}
+    scenarios = selected_scenarios(args)
+    urls = parse_urls(args.url)
+    check_urls(urls, {current.service for current in scenarios})
+    for current in scenarios:
+        target_for = target_factory(urls, current.service)
+        if current.setup:
+            current.setup(target_for({}))
+
+        def next_request(worker, iteration, current=current):
+            return current.make_request(worker, iteration)
+
+        # Warm up caches and connection pools outside the measurement
+        if args.warmup:
+            run_load(target_for, next_request, 1, iterations=args.warmup)
+        samples, elapsed = run_load(target_for, next_request, args.concurrency,
+                                    duration=args.duration, iterations=args.iterations)
+        results[current.name] = summarize(samples, elapsed)
+        print(format_summary(current.name, results[current.name]))
+    return results
+
+def replay_traffic(args):
+    source = ReplaySource(args.traffic, loops=args.loops)
+    if not source.entries:
+        sys.exit(f"No requests with a method and path in {args.traffic}")
+    default_service = args.service[0] if args.service else 'rooms'
+    urls = parse_urls(args.url)
+    check_urls(urls, {entry.get('service', default_service) for entry in source.entries})
+    target_for = target_factory(urls, default_service)
+
+    def next_request(worker, iteration):
+        entry = source(worker, iteration)
+        if entry is not None and 'label' not in entry:
+            entry = dict(entry, label=f"{entry['method']} {entry['path'].split('?')[0]}")
+        return entry
+
+    samples, elapsed = run_load(target_for, next_request, args.concurrency, duration=args.duration)
+    results = {'replay (all)': summarize(samples, elapsed)}
+    for label in sorted({label for label, _, _ in samples}):
+        results[label] = summarize([sample for sample in samples if sample[0] == label], elapsed)
+    for name, summary in results.items():
+        print(format_summary(name, summary))
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help='List the scenarios')
+
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument('--url', action='append',
+                        help='Running server instead of the in-process test client: URL for a single service, '
+                             'or SERVICE=URL, repeated per service')
+    common.add_argument('--concurrency', type=int, default=4, help='Worker threads (default 4)')
+    common.add_argument('--duration', type=float, help='Seconds to run each scenario')
+    common.add_argument('--service', action='append', choices=SERVICES)
+    common.add_argument('--output', help='Save the results as JSON')
+    common.add_argument('--baseline', help='Compare with a saved results file, exit 1 on regression')
+    common.add_argument('--tolerance', type=float, default=0.10, help='Allowed relative change (default 0.10)')
+    common.add_argument('--profile', action='store_true', help='Print the top cProfile entries (in process only)')
+
+    run = commands.add_parser('run', parents=[common], help='Run scenarios')
+    run.add_argument('--scenario', action='append', help='Scenario name, may be repeated (default all)')
+    run.add_argument('--iterations', type=int, help='Requests per worker (default 200 without --duration)')
+    run.add_argument('--warmup', type=int, default=10, help='Unmeasured requests before each scenario')
+
+    replay = commands.add_parser('replay', parents=[common], help='Replay captured traffic from a JSONL file')
+    replay.add_argument('traffic', help='JSONL file, one {"method", "path", ...} object per line')
+    replay.add_argument('--loops', type=int, default=1, help='How many times to play the file')
+
+    args = parser.parse_args(argv)
+    if args.command == 'list':
+        for current in SCENARIOS.values():
+            print(f"{current.service:<10} {current.name}")
+        return 0
+    if args.command == 'run' and args.duration is None and args.iterations is None:
+        args.iterations = 200
+
+    profiler = cProfile.Profile() if args.profile and not args.url else None
+    print(SUMMARY_HEADER)
+    if profiler:
+        profiler.enable()
+    results = run_scenarios(args) if args.command == 'run' else replay_traffic(args)
+    if profiler:
+        profiler.disable()
+        pstats.Stats(profiler).sort_stats('cumtime').print_stats(15)
+
+    config = {key: value for key, value in vars(args).items() if key not in ('output', 'baseline', 'profile')}
+    report = build_report(results, config)
+    if args.output:
+        save_report(report, args.output)
+        print(f"\nSaved results to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            rows = compare(report, json.load(baseline_file), args.tolerance)
+        print(f"\nCompared with {args.baseline} (tolerance {args.tolerance:.0%})")
+        for name, metric, before, after, change, regressed in rows:
+            print(f"{'REGRESSION' if regressed else 'ok':<10} {name:<28} {metric:<15} {before:>10.2f} -> {after:>10.2f} ({change:+.1%})")
+        if any(row[-1] for row in rows):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""
+Cold-start benchmark: how long a fresh interpreter takes to import each service.
+
+Every run starts a new Python process that imports the service's app module,
+which is what a gunicorn worker, a ``flask`` command or a test collection
+does first. Point ``DATABASE_URL`` and ``REDIS_URL`` at unreachable hosts to
+see what a slow or missing backend costs at import.
+
+Examples::
+
+    python -m benchmarks.coldstart
+    DATABASE_URL=postgresql://admin:x@10.255.255.1/db REDIS_URL=redis://10.255.255.1 python -m benchmarks.coldstart
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.report import build_report, percentile, save_report
+from benchmarks.runner import SERVICE_MODULES
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_time(module, timeout):
+    """
+    Times one import of a service module in a new interpreter.
+
+    :param module: Module path, e.g. ``rooms_service.app``.
+    :type module: str
+    :param timeout: Seconds before the import is abandoned.
+    :type timeout: float
+    :return: Wall time in milliseconds, or None after a timeout or error.
+    :rtype: float
+    """
+    started = time.perf_counter()
+    try:
+        subprocess.run([sys.executable, '-c', f"import {module}"], cwd=ROOT, timeout=timeout, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except (subprocess.TimeoutExpired, subprocess.CalledProcessError):
+        return None
+    return (time.perf_counter() - started) * 1000
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.coldstart', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help='Imports per service, the median is reported (default 5)')
+    parser.add_argument('--timeout', type=float, default=120, help='Seconds before an import is abandoned')
+    parser.add_argument('--service', action='append', choices=list(SERVICE_MODULES))
+    parser.add_argument('--output', help='Save the results as JSON')
+    args = parser.parse_args(argv)
+
+    # The baseline is an interpreter that only starts up
+    modules = {'python': 'sys'}
+    modules.update((name, module) for name, module in SERVICE_MODULES.items()
+                   if not args.service or name in args.service)
+    results = {}
+    print(f"{'service':<10} {'median ms':>10} {'max ms':>10}")
+    for name, module in modules.items():
+        timings = [import_time(module, args.timeout) for _ in range(args.repeat)]
+        if None in timings:
+            print(f"{name:<10} {'failed or timed out':>21}")
+            continue
+        timings.sort()
+        results[name] = {'median_ms': round(percentile(timings, 0.5), 1), 'max_ms': round(timings[-1], 1)}
+        print(f"{name:<10} {results[name]['median_ms']:>10.1f} {results[name]['max_ms']:>10.1f}")
+
+    if args.output:
+        save_report(build_report(results, {'repeat': args.repeat, 'database_url': os.environ.get('DATABASE_URL'),
+                                           'redis_url': os.environ.get('REDIS_URL')}), args.output)
+        print(f"\nSaved results to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
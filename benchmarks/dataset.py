@@ -0,0 +1,380 @@
+"""
+Synthetic dataset generator for every table of the meeting room services.
+
+Examples::
+
+    python -m benchmarks.dataset --scale 1000000 --seed 42
+    python -m benchmarks.dataset --rooms 5000 --bookings 20000000 --truncate
+    python -m benchmarks.dataset --scale 50000000 --chunk-size 200000
+
+Distributions are skewed like production traffic: a few hot rooms get most
+bookings and reviews (Zipf), bookings cluster in weekday peak hours, a few
+prolific users write most reviews and ratings lean positive. The same seed
+always produces the same rows. On Postgres, rows are bulk-loaded with COPY
+in chunks, so memory use does not grow with the row count. Other databases
+fall back to batched INSERTs.
+"""
+import argparse
+import csv
+import io
+import math
+import random
+import sys
+import time
+from bisect import bisect_left
+from datetime import datetime, timedelta
+from itertools import accumulate
+
+from sqlalchemy import text
+
+from benchmarks.runner import load_services
+
+# Share of --scale given to each table
+SCALE_SHARES = {'users': 0.05, 'rooms': 0.005, 'bookings': 0.70, 'reviews': 0.245}
+START_DATE = datetime(2024, 1, 1)
+BOOKING_DAYS = 730
+# Every generated user logs in with this password, hashed once
+DEFAULT_PASSWORD = 'dataset-password'
+
+BUILDINGS = [f"Building {letter}" for letter in 'ABCDEFGHJKLMNPQRSTUVWXYZ']
+EQUIPMENT = ['Projector', 'Whiteboard', 'TV', 'Video Conference', 'Speakerphone', 'HDMI', 'Flipchart']
+CAPACITIES = [2, 4, 4, 6, 6, 6, 8, 8, 10, 12, 16, 20, 30, 50, 100]
+ROLES = ['user'] * 96 + ['facility_manager'] * 2 + ['moderator', 'admin']
+# Relative booking demand per hour of the day, peaking mid-morning and after lunch
+HOUR_WEIGHTS = [0, 0, 0, 0, 0, 0, 0, 1, 4, 9, 10, 8, 4, 6, 9, 9, 7, 3, 1, 0, 0, 0, 0, 0]
+WEEKDAY_WEIGHTS = [10, 11, 11, 10, 7, 1, 1]
+RATING_WEIGHTS = [4, 6, 15, 35, 40]
+COMMENT_WORDS = (
+    "room projector screen chairs table quiet noisy bright dark clean cold warm wifi fast slow "
+    "great good fine okay poor broken working spacious cramped booking meeting view coffee "
+    "whiteboard markers cables sound video call comfortable"
+).split()
+
+TABLE_COLUMNS = {
+    'users': ('id', 'full_name', 'username', 'email', 'password', 'role'),
+    'rooms': ('id', 'name', 'capacity', 'equipment', 'location'),
+    'bookings': ('id', 'user_id', 'room_id', 'start_time', 'end_time'),
+    'reviews': ('id', 'user_id', 'room_id', 'rating', 'comment', 'timestamp', 'is_flagged'),
+}
+
+
+class ZipfSampler:
+    """
+    Draws IDs from ``first_id .. first_id + count - 1`` with a Zipf skew.
+
+    Ranks are spread over the ID range with a fixed stride, so the hottest
+    IDs are not simply the lowest ones.
+
+    :param first_id: Smallest ID.
+    :type first_id: int
+    :param count: Number of IDs.
+    :type count: int
+    :param exponent: Skew, 0 for uniform, around 1 for strongly skewed.
+    :type exponent: float
+    :param rng: Random generator.
+    :type rng: random.Random
+    """
+
+    def __init__(self, first_id, count, exponent, rng):
+        self.first_id = first_id
+        self.count = count
+        self.rng = rng
+        self.cumulative = list(accumulate(1 / (rank ** exponent) for rank in range(1, count + 1)))
+        self.stride = 7919
+        while math.gcd(self.stride, count) != 1:
+            self.stride += 2
+
+    def rank(self):
+        """
+        :return: A 0-based popularity rank, 0 being the most popular.
+        :rtype: int
+        """
+        return bisect_left(self.cumulative, self.rng.random() * self.cumulative[-1])
+
+    def id_of(self, rank):
+        """
+        :return: The ID holding a popularity rank.
+        :rtype: int
+        """
+        return self.first_id + (rank * self.stride) % self.count
+
+    def __call__(self):
+        return self.id_of(self.rank())
+
+def table_rng(seed, table):
+    """
+    Returns the random generator of one table, independent of the other tables' sizes.
+
+    :rtype: random.Random
+    """
+    return random.Random(f"{seed}:{table}")
+
+def generate_users(first_id, count, seed):
+    """
+    Yields user rows with encrypted names and a shared password hash.
+
+    :param first_id: ID of the first row.
+    :type first_id: int
+    :param count: Number of rows.
+    :type count: int
+    :param seed: Dataset seed.
+    :type seed: int
+    :return: Generator of row tuples in ``TABLE_COLUMNS['users']`` order.
+    :rtype: generator
+    """
+    from werkzeug.security import generate_password_hash
+    try:
+        from users_service.crypto_utils import encrypt_data
+    except ImportError:
+        sys.path.insert(0, 'users_service')
+        from crypto_utils import encrypt_data
+
+    rng = table_rng(seed, 'users')
+    password = generate_password_hash(DEFAULT_PASSWORD, method='pbkdf2:sha256')
+    for user_id in range(first_id, first_id + count):
+        yield (user_id, encrypt_data(f"User {user_id}"), f"user{user_id}", f"user{user_id}@example.com",
+               password, rng.choice(ROLES))
+
+def generate_rooms(first_id, count, seed):
+    """
+    Yields room rows. Small rooms and a few busy buildings dominate.
+
+    :return: Generator of row tuples in ``TABLE_COLUMNS['rooms']`` order.
+    :rtype: generator
+    """
+    rng = table_rng(seed, 'rooms')
+    building_of = ZipfSampler(0, len(BUILDINGS), 0.8, rng)
+    for room_id in range(first_id, first_id + count):
+        equipment = ','.join(sorted(rng.sample(EQUIPMENT, rng.randint(0, 4))))
+        yield (room_id, f"Room {room_id}", rng.choice(CAPACITIES), equipment or None,
+               f"{BUILDINGS[building_of()]}, Floor {rng.randint(1, 12)}")
+
+def generate_bookings(first_id, count, seed, room_ids, user_ids):
+    """
+    Yields non-overlapping bookings, concentrated on hot rooms and peak hours.
+
+    Each room gets a Zipf share of ``count``. Its bookings take distinct
+    one-hour slots drawn from the weekday and hour weights, lasting 30 or 60
+    minutes, so no two bookings of a room overlap. A room never gets more
+    than half of its slots; the excess goes to the next rooms, and fewer
+    rows than ``count`` are generated only when every room is that full.
+
+    :param room_ids: ``(first_id, count)`` of the rooms referenced.
+    :type room_ids: tuple
+    :param user_ids: ``(first_id, count)`` of the users referenced.
+    :type user_ids: tuple
+    :return: Generator of row tuples in ``TABLE_COLUMNS['bookings']`` order.
+    :rtype: generator
+    """
+    rng = table_rng(seed, 'bookings')
+    user_of = ZipfSampler(user_ids[0], user_ids[1], 0.6, rng)
+    rooms = ZipfSampler(room_ids[0], room_ids[1], 1.0, rng)
+    total_weight = rooms.cumulative[-1]
+    days = [START_DATE + timedelta(days=offset) for offset in range(BOOKING_DAYS)]
+    day_weights = list(accumulate(WEEKDAY_WEIGHTS[day.weekday()] for day in days))
+    hour_weights = list(accumulate(HOUR_WEIGHTS))
+    max_per_room = BOOKING_DAYS * sum(1 for weight in HOUR_WEIGHTS if weight) // 2
+
+    booking_id = first_id
+    remaining = count
+    for rank in range(room_ids[1]):
+        if remaining <= 0:
+            break
+        before = rooms.cumulative[rank - 1] if rank else 0
+        # Share of what is left, so bookings capped on hot rooms go to the next ones
+        share = round(remaining * (rooms.cumulative[rank] - before) / (total_weight - before))
+        share = min(share, max_per_room)
+        room_id = rooms.id_of(rank)
+        taken = set()
+        while len(taken) < share:
+            day = bisect_left(day_weights, rng.random() * day_weights[-1])
+            hour = bisect_left(hour_weights, rng.random() * hour_weights[-1])
+            if (day, hour) in taken:
+                continue
+            taken.add((day, hour))
+            half_past = rng.random() < 0.25
+            start = days[day] + timedelta(hours=hour, minutes=30 if half_past else 0)
+            minutes = 30 if half_past or rng.random() < 0.4 else 60
+            yield (booking_id, user_of(), room_id, start, start + timedelta(minutes=minutes))
+            booking_id += 1
+        remaining -= share
+
+def generate_reviews(first_id, count, seed, room_ids, user_ids):
+    """
+    Yields reviews written mostly by prolific users about hot rooms.
+
+    Ratings lean positive, about 2% of reviews are flagged and some comments
+    contain characters that need escaping.
+
+    :return: Generator of row tuples in ``TABLE_COLUMNS['reviews']`` order.
+    :rtype: generator
+    """
+    rng = table_rng(seed, 'reviews')
+    user_of = ZipfSampler(user_ids[0], user_ids[1], 1.1, rng)
+    room_of = ZipfSampler(room_ids[0], room_ids[1], 1.0, rng)
+    ratings = list(accumulate(RATING_WEIGHTS))
+    span = BOOKING_DAYS * 86400
+    for review_id in range(first_id, first_id + count):
+        words = rng.choices(COMMENT_WORDS, k=rng.randint(3, 25))
+        if rng.random() < 0.05:
+            words.append('& <b>really</b> > expected')
+        yield (review_id, user_of(), room_of(), bisect_left(ratings, rng.random() * ratings[-1]) + 1,
+               ' '.join(words).capitalize(), START_DATE + timedelta(seconds=rng.randrange(span)),
+               rng.random() < 0.02)
+
+def chunks(rows, size):
+    """
+    Groups an iterable into lists of at most ``size`` items.
+
+    :rtype: generator
+    """
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def copy_rows(connection, table, rows):
+    """
+    Loads rows with ``COPY ... FROM STDIN`` (CSV).
+
+    :param connection: Raw psycopg2 connection.
+    :param table: Table name.
+    :type table: str
+    :param rows: Row tuples in ``TABLE_COLUMNS[table]`` order.
+    :type rows: list
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow('' if value is None else value for value in row)
+    buffer.seek(0)
+    columns = ', '.join(f'"{column}"' for column in TABLE_COLUMNS[table])
+    with connection.cursor() as cursor:
+        cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+
+def insert_rows(connection, table, rows):
+    """
+    Loads rows with a batched INSERT, for databases without COPY.
+
+    :param connection: Raw DBAPI connection.
+    :param table: Table name.
+    :type table: str
+    :param rows: Row tuples in ``TABLE_COLUMNS[table]`` order.
+    :type rows: list
+    """
+    columns = ', '.join(f'"{column}"' for column in TABLE_COLUMNS[table])
+    placeholders = ', '.join('?' for _ in TABLE_COLUMNS[table])
+    cursor = connection.cursor()
+    cursor.executemany(f"INSERT INTO {table} ({columns}) VALUES ({placeholders})", rows)
+    cursor.close()
+
+def load_table(engine, table, rows, chunk_size):
+    """
+    Streams generated rows into a table, committing each chunk.
+
+    :param engine: SQLAlchemy engine.
+    :param table: Table name.
+    :type table: str
+    :param rows: Generator of row tuples.
+    :param chunk_size: Rows per COPY or INSERT batch.
+    :type chunk_size: int
+    :return: Number of rows loaded.
+    :rtype: int
+    """
+    postgres = engine.dialect.name == 'postgresql'
+    loaded = 0
+    connection = engine.raw_connection()
+    try:
+        for chunk in chunks(rows, chunk_size):
+            (copy_rows if postgres else insert_rows)(connection, table, chunk)
+            connection.commit()
+            loaded += len(chunk)
+            print(f"\r  {table}: {loaded:,} rows", end='', flush=True)
+    finally:
+        connection.close()
+    print()
+    return loaded
+
+def id_range(connection, table):
+    """
+    Returns the current highest ID and row count of a table.
+
+    :rtype: tuple
+    """
+    return connection.execute(text(f"SELECT coalesce(max(id), 0), count(*) FROM {table}")).one()
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.dataset', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', type=int, help='Total rows, split across the tables')
+    for table in TABLE_COLUMNS:
+        parser.add_argument(f'--{table}', type=int, help=f'Rows to add to {table} (overrides --scale)')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed (default 42)')
+    parser.add_argument('--chunk-size', type=int, default=100000, help='Rows per COPY batch (default 100000)')
+    parser.add_argument('--truncate', action='store_true', help='Empty every table first')
+    args = parser.parse_args(argv)
+
+    sizes = {table: getattr(args, table) for table in TABLE_COLUMNS}
+    for table, share in SCALE_SHARES.items():
+        if sizes[table] is None:
+            sizes[table] = max(1, int(args.scale * share)) if args.scale else 0
+    if not any(sizes.values()):
+        parser.error('give --scale or a row count for at least one table')
+
+    modules = load_services()
+    apps = {name: module.app for name, module in modules.items()}
+    reviews_module = modules['reviews']
+    with apps['reviews'].app_context():
+        db = reviews_module.db
+        engine = db.engine
+        with engine.begin() as connection:
+            if args.truncate:
+                tables = ', '.join(list(TABLE_COLUMNS) + ['room_rating_summaries', 'review_analytics'])
+                if engine.dialect.name == 'postgresql':
+                    connection.execute(text(f"TRUNCATE {tables} RESTART IDENTITY"))
+                else:
+                    for table in tables.split(', '):
+                        connection.execute(text(f"DELETE FROM {table}"))
+            ranges = {table: id_range(connection, table) for table in TABLE_COLUMNS}
+
+        started = time.perf_counter()
+        print(f"Generating with seed {args.seed}: " + ', '.join(f"{table}={size:,}" for table, size in sizes.items()))
+        referenced = {}
+        for table in ('users', 'rooms'):
+            last_id, _ = ranges[table]
+            if sizes[table]:
+                generator = generate_users if table == 'users' else generate_rooms
+                load_table(engine, table, generator(last_id + 1, sizes[table], args.seed), args.chunk_size)
+            # Bookings and reviews reference every existing and new ID
+            referenced[table] = (1, max(last_id + sizes[table], 1))
+
+        for table, generator in (('bookings', generate_bookings), ('reviews', generate_reviews)):
+            if sizes[table]:
+                rows = generator(ranges[table][0] + 1, sizes[table], args.seed, referenced['rooms'], referenced['users'])
+                load_table(engine, table, rows, args.chunk_size)
+
+        with engine.begin() as connection:
+            if engine.dialect.name == 'postgresql':
+                # Explicit IDs bypass the sequences, so move them past the new rows
+                for table in TABLE_COLUMNS:
+                    connection.execute(text(
+                        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), coalesce(max(id), 1)) FROM {table}"
+                    ))
+        if sizes['reviews']:
+            print("Rebuilding review search documents and rating totals...")
+            runner = apps['reviews'].test_cli_runner()
+            runner.invoke(args=['reindex-search'])
+            runner.invoke(args=['reconcile-ratings'])
+        if engine.dialect.name == 'postgresql':
+            with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+                connection.execute(text('ANALYZE'))
+        print(f"Done in {time.perf_counter() - started:.1f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
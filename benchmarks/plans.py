@@ -0,0 +1,281 @@
+"""
+Query plan regression suite for the SQL the endpoints actually emit.
+
+Each case calls one endpoint through the service's Flask test client and
+records the SELECT statements it runs. Every statement is then run again
+under ``EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)`` and checked against the
+budgets in ``plan_budgets.json``:
+
+- no Seq Scan on a table with more than ``min_seq_scan_rows`` rows, unless
+  the case allows it for that table;
+- total planner cost at most ``max_cost``;
+- total execution time at most ``max_ms``.
+
+Run it against a production-sized dataset (``python -m benchmarks.dataset``)
+before every deploy. The exit status is 1 when any case fails.
+
+Examples::
+
+    python -m benchmarks.plans
+    python -m benchmarks.plans --case booking_conflict_check --verbose
+    python -m benchmarks.plans --update-budgets
+    python -m benchmarks.plans --capture-only
+"""
+import argparse
+import json
+import os
+import sys
+
+from sqlalchemy import event, text
+
+from benchmarks.dataset import DEFAULT_PASSWORD
+from benchmarks.runner import load_services
+
+BUDGETS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'plan_budgets.json')
+# Headroom given to the measured cost by --update-budgets
+COST_HEADROOM = 1.5
+
+
+class PlanCase:
+    """
+    One endpoint call whose queries are checked.
+
+    :param name: Case name, the key of its budget.
+    :type name: str
+    :param service: Service name, e.g. ``bookings``.
+    :type service: str
+    :param request: ``context -> dict`` with ``method``, ``path`` and optionally ``json``.
+    :type request: callable
+    """
+
+    def __init__(self, name, service, request):
+        self.name = name
+        self.service = service
+        self.request = request
+
+CASES = [
+    PlanCase('booking_conflict_check', 'bookings', lambda c: {
+        'method': 'POST', 'path': '/bookings/check',
+        'json': {"room_id": c['hot_room'], "start_time": c['busy_start'], "end_time": c['busy_end']}}),
+    # Targets an existing booking, so the request is rejected with 409 and nothing is written
+    PlanCase('booking_conflict_alternatives', 'bookings', lambda c: {
+        'method': 'POST', 'path': '/bookings',
+        'json': {"user_id": c['user_id'], "room_id": c['hot_room'], "start_time": c['busy_start'],
+                 "end_time": c['busy_end'], "alternatives": 5}}),
+    PlanCase('user_bookings', 'bookings', lambda c: {
+        'method': 'GET', 'path': f"/bookings?user_id={c['user_id']}"}),
+    PlanCase('rooms_filter', 'rooms', lambda c: {
+        'method': 'GET', 'path': '/rooms?capacity=20&location=Building A&equipment=Projector'}),
+    PlanCase('rooms_available', 'rooms', lambda c: {
+        'method': 'GET', 'path': f"/rooms/available?start_time={c['busy_start']}&end_time={c['busy_end']}&capacity=8"}),
+    PlanCase('rooms_by_rating', 'rooms', lambda c: {
+        'method': 'GET', 'path': '/rooms?sort=rating&min_rating=4'}),
+    PlanCase('user_lookup', 'users', lambda c: {
+        'method': 'GET', 'path': f"/users/{c['username']}"}),
+    PlanCase('user_login', 'users', lambda c: {
+        'method': 'POST', 'path': '/users/login',
+        'json': {"username": c['username'], "password": DEFAULT_PASSWORD}}),
+    PlanCase('room_reviews', 'reviews', lambda c: {
+        'method': 'GET', 'path': f"/reviews/room/{c['hot_room']}?limit=20"}),
+    PlanCase('room_reviews_batch', 'reviews', lambda c: {
+        'method': 'GET', 'path': f"/reviews?room_ids={c['reviewed_rooms']}&limit=5"}),
+    PlanCase('review_search', 'reviews', lambda c: {
+        'method': 'GET', 'path': '/reviews/search?q=broken projector'}),
+    PlanCase('room_review_analytics', 'reviews', lambda c: {
+        'method': 'GET', 'path': f"/api/v1/analytics/room/{c['hot_room']}"}),
+]
+
+def load_context(connection):
+    """
+    Picks realistic parameters from the dataset: the busiest room, one of its bookings, a user.
+
+    :param connection: SQLAlchemy connection.
+    :return: Values used to build the case requests.
+    :rtype: dict
+    """
+    hot_room = connection.execute(text(
+        "SELECT room_id FROM bookings GROUP BY room_id ORDER BY count(*) DESC LIMIT 1"
+    )).scalar() or 1
+    busy = connection.execute(text(
+        "SELECT start_time, end_time FROM bookings WHERE room_id = :room_id ORDER BY start_time DESC LIMIT 1"
+    ), {'room_id': hot_room}).first()
+    user = connection.execute(text("SELECT id, username FROM users ORDER BY id LIMIT 1")).first()
+    reviewed = connection.execute(text(
+        "SELECT room_id FROM reviews GROUP BY room_id ORDER BY count(*) DESC LIMIT 3"
+    )).scalars().all()
+    return {
+        'hot_room': hot_room,
+        # str() also covers drivers returning timestamps as text
+        'busy_start': str(busy[0]).replace(' ', 'T') if busy else '2025-01-06T10:00:00',
+        'busy_end': str(busy[1]).replace(' ', 'T') if busy else '2025-01-06T11:00:00',
+        'user_id': user[0] if user else 1,
+        'username': user[1] if user else 'user1',
+        'reviewed_rooms': ','.join(str(room_id) for room_id in reviewed) or str(hot_room),
+    }
+
+def capture_statements(module, spec):
+    """
+    Calls an endpoint and records the SELECT statements it executes.
+
+    :param module: The service's app module.
+    :param spec: The request, from :attr:`PlanCase.request`.
+    :type spec: dict
+    :return: The response status and the ``(statement, parameters)`` pairs.
+    :rtype: tuple
+    """
+    captured = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if not executemany and statement.lstrip().upper().startswith(('SELECT', 'WITH')):
+            captured.append((statement, parameters))
+
+    with module.app.app_context():
+        engine = module.db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    try:
+        client = module.app.test_client()
+        response = client.open(spec['path'], method=spec['method'], json=spec.get('json'))
+    finally:
+        event.remove(engine, 'before_cursor_execute', record)
+    return response.status_code, captured
+
+def plan_nodes(node):
+    """
+    Yields a plan node and all of its descendants.
+
+    :rtype: generator
+    """
+    yield node
+    for child in node.get('Plans', []):
+        yield from plan_nodes(child)
+
+def explain(engine, statement, parameters):
+    """
+    Runs a statement under ``EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)`` and rolls back.
+
+    :return: The top-level plan object, with ``Plan`` and ``Execution Time``.
+    :rtype: dict
+    """
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {statement}", parameters)
+        result = cursor.fetchone()[0]
+        connection.rollback()
+    finally:
+        connection.close()
+    return (json.loads(result) if isinstance(result, str) else result)[0]
+
+def table_sizes(connection):
+    """
+    Returns the planner's row estimate of every table.
+
+    :rtype: dict
+    """
+    rows = connection.execute(text("SELECT relname, reltuples FROM pg_class WHERE relkind = 'r'"))
+    return {name: tuples for name, tuples in rows}
+
+def check_case(case, plans, budget, defaults, sizes):
+    """
+    Checks the plans of one case against its budget.
+
+    :param plans: Plans from :func:`explain`, one per statement.
+    :type plans: list
+    :param budget: The case's budget, may be empty.
+    :type budget: dict
+    :param defaults: Default budget values.
+    :type defaults: dict
+    :param sizes: Table row estimates.
+    :type sizes: dict
+    :return: Totals and the list of failures.
+    :rtype: dict
+    """
+    min_rows = budget.get('min_seq_scan_rows', defaults.get('min_seq_scan_rows', 10000))
+    allowed = set(budget.get('allow_seq_scan', []))
+    max_ms = budget.get('max_ms', defaults.get('max_ms'))
+    max_cost = budget.get('max_cost')
+
+    cost = sum(plan['Plan']['Total Cost'] for plan in plans)
+    elapsed = sum(plan['Execution Time'] for plan in plans)
+    shared_read = sum(plan['Plan'].get('Shared Read Blocks', 0) for plan in plans)
+    failures = []
+    for plan in plans:
+        for node in plan_nodes(plan['Plan']):
+            relation = node.get('Relation Name')
+            if node['Node Type'] == 'Seq Scan' and relation not in allowed and sizes.get(relation, 0) > min_rows:
+                failures.append(f"Seq Scan on {relation} ({int(sizes[relation]):,} rows)")
+    if max_cost is not None and cost > max_cost:
+        failures.append(f"cost {cost:,.0f} over budget {max_cost:,.0f}")
+    if max_ms is not None and elapsed > max_ms:
+        failures.append(f"{elapsed:.1f}ms over budget {max_ms}ms")
+    return {'statements': len(plans), 'cost': round(cost, 2), 'ms': round(elapsed, 3),
+            'shared_read_blocks': shared_read, 'failures': failures}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.plans', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--case', action='append', help='Only this case, may be repeated')
+    parser.add_argument('--budgets', default=BUDGETS_PATH, help='Budgets file (default benchmarks/plan_budgets.json)')
+    parser.add_argument('--update-budgets', action='store_true',
+                        help=f'Set every max_cost to the measured cost x{COST_HEADROOM}')
+    parser.add_argument('--capture-only', action='store_true', help='Print the captured SQL without EXPLAIN')
+    parser.add_argument('--verbose', action='store_true', help='Print the statements and plans')
+    parser.add_argument('--output', help='Save the results as JSON')
+    args = parser.parse_args(argv)
+
+    with open(args.budgets) as budgets_file:
+        budgets = json.load(budgets_file)
+    defaults = budgets.get('defaults', {})
+    modules = load_services()
+    cases = [case for case in CASES if not args.case or case.name in args.case]
+
+    with modules['bookings'].app.app_context():
+        engine = modules['bookings'].db.engine
+        with engine.connect() as connection:
+            context = load_context(connection)
+            postgres = engine.dialect.name == 'postgresql'
+            sizes = table_sizes(connection) if postgres else {}
+    if not postgres and not args.capture_only:
+        sys.exit("EXPLAIN (ANALYZE, BUFFERS) needs Postgres; use --capture-only to list the SQL.")
+
+    results, failed = {}, 0
+    for case in cases:
+        module = modules[case.service]
+        status, statements = capture_statements(module, case.request(context))
+        if args.capture_only or args.verbose:
+            print(f"\n== {case.name} (HTTP {status}, {len(statements)} statements)")
+            for statement, parameters in statements:
+                print(f"{statement}\n  -- {parameters}")
+        if args.capture_only:
+            continue
+
+        with module.app.app_context():
+            plans = [explain(module.db.engine, statement, parameters) for statement, parameters in statements]
+        result = check_case(case, plans, budgets.get('cases', {}).get(case.name, {}), defaults, sizes)
+        results[case.name] = result
+        failed += bool(result['failures'])
+        if args.verbose:
+            for plan in plans:
+                print(json.dumps(plan['Plan'], indent=2))
+        verdict = 'FAIL' if result['failures'] else 'ok'
+        print(f"{verdict:<5} {case.name:<30} {result['statements']:>3} stmts  cost {result['cost']:>12,.1f}  "
+              f"{result['ms']:>9.2f} ms  read {result['shared_read_blocks']:>7} blocks  {'; '.join(result['failures'])}")
+
+    if args.capture_only:
+        return 0
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump({'context': context, 'results': results}, output_file, indent=2)
+    if args.update_budgets:
+        for name, result in results.items():
+            budgets.setdefault('cases', {}).setdefault(name, {})['max_cost'] = round(result['cost'] * COST_HEADROOM, 1)
+        with open(args.budgets, 'w') as budgets_file:
+            json.dump(budgets, budgets_file, indent=2)
+            budgets_file.write('\n')
+        print(f"\nUpdated the cost budgets in {args.budgets}")
+    print(f"\n{len(results) - failed} passed, {failed} failed")
+    return 1 if failed and not args.update_budgets else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
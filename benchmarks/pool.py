@@ -0,0 +1,114 @@
+"""
+Connection pool saturation benchmark.
+
+Client threads each run a statement and hold the connection for a while, as
+a slow query would, against the bookings service's engine. The pool is made
+deliberately small so the clients saturate it; the report shows the request
+latencies with checkout timeouts counted as errors, and the pool counters
+(overflow checkouts, timeouts, checkout wait, peak connections in use).
+
+Examples::
+
+    python -m benchmarks.pool
+    python -m benchmarks.pool --clients 40 --hold 0.1 --pool-size 10 --max-overflow 5 --output pool.json
+"""
+import argparse
+import importlib
+import os
+import sys
+import threading
+import time
+
+from sqlalchemy import exc, text
+
+from benchmarks.report import SUMMARY_HEADER, build_report, format_summary, save_report, summarize
+from benchmarks.runner import SERVICE_MODULES
+from common.db_pool import pool_stats, pool_status
+
+
+def client_run(module, requests, hold, samples):
+    """
+    Runs one client's statements, each holding its connection for ``hold`` seconds.
+
+    :param module: The bookings app module.
+    :param requests: Statements to run.
+    :type requests: int
+    :param hold: Seconds each connection is held.
+    :type hold: float
+    :param samples: List receiving ``(label, seconds, status)`` samples, status 0 on a checkout timeout.
+    :type samples: list
+    """
+    for _ in range(requests):
+        with module.app.app_context():
+            start = time.perf_counter()
+            try:
+                module.db.session.execute(text('SELECT 1'))
+                time.sleep(hold)
+                module.db.session.commit()
+                samples.append(('hold', time.perf_counter() - start, 200))
+            except exc.TimeoutError:
+                samples.append(('hold', time.perf_counter() - start, 0))
+            finally:
+                module.db.session.remove()
+
+def sample_pool(module, peaks, stop):
+    """Records the connections in use every 10 ms until ``stop`` is set."""
+    with module.app.app_context():
+        while not stop.is_set():
+            peaks.append(pool_status(module.db.engine)['checked_out'])
+            time.sleep(0.01)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.pool', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clients', type=int, default=20, help='Client threads (default 20)')
+    parser.add_argument('--requests', type=int, default=20, help='Statements per client (default 20)')
+    parser.add_argument('--hold', type=float, default=0.05, help='Seconds each connection is held (default 0.05)')
+    parser.add_argument('--pool-size', type=int, default=4, help='DB_POOL_SIZE (default 4)')
+    parser.add_argument('--max-overflow', type=int, default=2, help='DB_MAX_OVERFLOW (default 2)')
+    parser.add_argument('--pool-timeout', type=int, default=1, help='DB_POOL_TIMEOUT in seconds (default 1)')
+    parser.add_argument('--output', help='Save the results as JSON')
+    args = parser.parse_args(argv)
+
+    # The engine reads its pool settings when the app is imported
+    os.environ.update(DB_POOL_SIZE=str(args.pool_size), DB_MAX_OVERFLOW=str(args.max_overflow),
+                      DB_POOL_TIMEOUT=str(args.pool_timeout))
+    module = importlib.import_module(SERVICE_MODULES['bookings'])
+    print(f"Pool: size={args.pool_size} max_overflow={args.max_overflow} timeout={args.pool_timeout}s, "
+          f"{args.clients} clients x {args.requests} statements holding a connection {args.hold}s")
+
+    pool_stats.reset()
+    samples, peaks, stop = [], [], threading.Event()
+    sampler = threading.Thread(target=sample_pool, args=(module, peaks, stop))
+    sampler.start()
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client_run, args=(module, args.requests, args.hold, samples))
+               for _ in range(args.clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    stop.set()
+    sampler.join()
+
+    with module.app.app_context():
+        final = pool_status(module.db.engine)
+    pool = {key: final[key] for key in ('timeouts', 'overflow_checkouts', 'avg_wait_ms', 'max_wait_ms')}
+    pool['peak_checked_out'] = max(peaks, default=0)
+    results = {'pool_hold': dict(summarize(samples, elapsed), pool=pool)}
+    print(SUMMARY_HEADER)
+    print(format_summary('pool_hold', results['pool_hold']))
+    print(f"\nPool timeouts: {pool['timeouts']}, overflow checkouts: {pool['overflow_checkouts']}, "
+          f"peak checked out: {pool['peak_checked_out']}, "
+          f"checkout wait avg {pool['avg_wait_ms']} ms / max {pool['max_wait_ms']} ms")
+
+    if args.output:
+        config = {key: value for key, value in vars(args).items() if key != 'output'}
+        save_report(build_report(results, config), args.output)
+        print(f"\nSaved results to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,125 @@
+import json
+import math
+import platform
+from datetime import datetime, timezone
+
+
+def percentile(sorted_values, fraction):
+    """
+    Nearest-rank percentile of an ascending list.
+
+    :param sorted_values: Values in ascending order.
+    :type sorted_values: list
+    :param fraction: Percentile between 0 and 1, e.g. 0.95.
+    :type fraction: float
+    :return: The percentile, or 0.0 for an empty list.
+    :rtype: float
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def summarize(samples, elapsed):
+    """
+    Computes throughput, error count and latency percentiles.
+
+    Statuses of 500 and above, and 0 (connection errors), count as errors.
+
+    :param samples: ``(label, seconds, status)`` samples.
+    :type samples: list
+    :param elapsed: Wall time of the run in seconds.
+    :type elapsed: float
+    :return: Request count, errors, throughput and latency in milliseconds.
+    :rtype: dict
+    """
+    latencies = sorted(seconds * 1000 for _, seconds, _ in samples)
+    errors = sum(1 for _, _, status in samples if status == 0 or status >= 500)
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'throughput_rps': round(len(samples) / elapsed, 2) if elapsed else 0.0,
+        'latency_ms': {
+            'p50': round(percentile(latencies, 0.50), 3),
+            'p95': round(percentile(latencies, 0.95), 3),
+            'p99': round(percentile(latencies, 0.99), 3),
+            'mean': round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+            'max': round(latencies[-1], 3) if latencies else 0.0,
+        },
+    }
+
+def build_report(results, config):
+    """
+    Wraps scenario summaries with the run configuration.
+
+    :param results: Summary per scenario or replay label.
+    :type results: dict
+    :param config: Settings of the run (concurrency, duration, target...).
+    :type config: dict
+    :return: The report, ready to be saved as JSON.
+    :rtype: dict
+    """
+    return {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'config': config,
+        'results': results,
+    }
+
+def save_report(report, path):
+    """
+    Writes a report as JSON.
+
+    :param report: The report from :func:`build_report`.
+    :type report: dict
+    :param path: Output path.
+    :type path: str
+    """
+    with open(path, 'w') as report_file:
+        json.dump(report, report_file, indent=2)
+        report_file.write('\n')
+
+def compare(report, baseline, tolerance=0.10):
+    """
+    Compares a report with a saved baseline.
+
+    A scenario regresses when its p95 or p99 latency grows, or its throughput
+    drops, by more than ``tolerance`` (a fraction). Scenarios missing from
+    either side are ignored.
+
+    :param report: The current report.
+    :type report: dict
+    :param baseline: A report saved earlier.
+    :type baseline: dict
+    :param tolerance: Allowed relative change.
+    :type tolerance: float
+    :return: One row per scenario: name, metric, baseline value, current value, change, regressed.
+    :rtype: list
+    """
+    rows = []
+    for name, current in report['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous:
+            continue
+        for metric, before, after, higher_is_worse in (
+            ('p95_ms', previous['latency_ms']['p95'], current['latency_ms']['p95'], True),
+            ('p99_ms', previous['latency_ms']['p99'], current['latency_ms']['p99'], True),
+            ('throughput_rps', previous['throughput_rps'], current['throughput_rps'], False),
+        ):
+            change = (after - before) / before if before else 0.0
+            regressed = change > tolerance if higher_is_worse else change < -tolerance
+            rows.append((name, metric, before, after, change, regressed))
+    return rows
+
+def format_summary(name, summary):
+    """
+    Formats one scenario summary as a table row.
+
+    :return: The row.
+    :rtype: str
+    """
+    latency = summary['latency_ms']
+    return (f"{name:<28} {summary['requests']:>8} {summary['errors']:>6} {summary['throughput_rps']:>10.1f} "
+            f"{latency['p50']:>9.2f} {latency['p95']:>9.2f} {latency['p99']:>9.2f}")
+
+SUMMARY_HEADER = f"{'scenario':<28} {'requests':>8} {'errors':>6} {'req/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}"
@@ -0,0 +1,188 @@
+import importlib
+import json
+import threading
+import time
+
+import requests
+
+SERVICE_MODULES = {
+    'rooms': 'rooms_service.app',
+    'bookings': 'bookings_service.app',
+    'reviews': 'reviews_service.app',
+    'users': 'users_service.app',
+}
+
+
+def load_services():
+    """
+    Imports every service and creates its missing tables, as ``init-db`` does.
+
+    The services share one database and some read tables owned by another,
+    so all of them are set up even when only one is exercised.
+
+    :return: The app module of each service.
+    :rtype: dict
+    """
+    modules = {}
+    for name, module in SERVICE_MODULES.items():
+        modules[name] = importlib.import_module(module)
+        with modules[name].app.app_context():
+            modules[name].db.create_all()
+    return modules
+
+class InProcessTarget:
+    """
+    Sends requests through the Flask test client of a service.
+
+    :param service: Service name, e.g. ``rooms``.
+    :type service: str
+    """
+
+    def __init__(self, service):
+        self.app = load_services()[service].app
+        self.local = threading.local()
+
+    def send(self, method, path, json=None, headers=None):
+        """
+        Sends one request.
+
+        :return: The response status code.
+        :rtype: int
+        """
+        client = getattr(self.local, 'client', None)
+        if client is None:
+            client = self.local.client = self.app.test_client()
+        return client.open(path, method=method, json=json, headers=headers).status_code
+
+    def fetch(self, method, path, json=None, headers=None):
+        """
+        Sends one request and reads its JSON body, for seeding steps.
+
+        :return: The status code and the decoded body, None if it is not JSON.
+        :rtype: tuple
+        """
+        response = self.app.test_client().open(path, method=method, json=json, headers=headers)
+        return response.status_code, response.get_json(silent=True)
+
+class HttpTarget:
+    """
+    Sends requests to a running server, one keep-alive session per thread.
+
+    :param base_url: Server address, e.g. ``http://localhost:4000``.
+    :type base_url: str
+    :param timeout: Request timeout in seconds.
+    :type timeout: float
+    """
+
+    def __init__(self, base_url, timeout=30):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.local = threading.local()
+
+    def send(self, method, path, json=None, headers=None):
+        """
+        Sends one request. Connection errors count as status 0.
+
+        :return: The response status code.
+        :rtype: int
+        """
+        session = getattr(self.local, 'session', None)
+        if session is None:
+            session = self.local.session = requests.Session()
+        try:
+            return session.request(method, self.base_url + path, json=json, headers=headers,
+                                   timeout=self.timeout).status_code
+        except requests.RequestException:
+            return 0
+
+    def fetch(self, method, path, json=None, headers=None):
+        """
+        Sends one request and reads its JSON body, for seeding steps.
+
+        :return: The status code and the decoded body, None if it is not JSON.
+        :rtype: tuple
+        """
+        response = requests.request(method, self.base_url + path, json=json, headers=headers, timeout=self.timeout)
+        try:
+            return response.status_code, response.json()
+        except ValueError:
+            return response.status_code, None
+
+class ReplaySource:
+    """
+    Hands out captured requests from a JSONL file to the workers, in order.
+
+    Each line is an object with ``method`` and ``path``, and optionally
+    ``service``, ``json``, ``headers`` and ``label``. Lines without a method
+    or path (e.g. comments or other records) are skipped.
+
+    :param path: Path of the traffic file.
+    :type path: str
+    :param loops: How many times to play the file.
+    :type loops: int
+    """
+
+    def __init__(self, path, loops=1):
+        with open(path) as traffic_file:
+            entries = [json.loads(line) for line in traffic_file if line.strip()]
+        self.entries = [entry for entry in entries if entry.get('method') and entry.get('path')]
+        self.total = len(self.entries) * loops
+        self.position = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, worker, iteration):
+        with self.lock:
+            if self.position >= self.total:
+                return None
+            entry = self.entries[self.position % len(self.entries)]
+            self.position += 1
+        return entry
+
+def run_load(target_for, next_request, concurrency, duration=None, iterations=None):
+    """
+    Runs requests from ``concurrency`` threads and records every latency.
+
+    Each worker stops after ``iterations`` requests, once ``duration``
+    seconds have passed, or when ``next_request`` returns None.
+
+    :param target_for: Returns the target of a request, e.g. by service.
+    :type target_for: callable
+    :param next_request: ``(worker, iteration) -> dict`` of the next request, or None.
+    :type next_request: callable
+    :param concurrency: Number of worker threads.
+    :type concurrency: int
+    :param duration: Seconds to run for.
+    :type duration: float
+    :param iterations: Requests per worker.
+    :type iterations: int
+    :return: ``(label, seconds, status)`` samples and the elapsed wall time.
+    :rtype: tuple
+    """
+    samples = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration if duration else None
+
+    def worker(number):
+        local_samples = []
+        iteration = 0
+        while iterations is None or iteration < iterations:
+            if deadline and time.perf_counter() >= deadline:
+                break
+            spec = next_request(number, iteration)
+            if spec is None:
+                break
+            target = target_for(spec)
+            start = time.perf_counter()
+            status = target.send(spec['method'], spec['path'], spec.get('json'), spec.get('headers'))
+            local_samples.append((spec.get('label'), time.perf_counter() - start, status))
+            iteration += 1
+        with lock:
+            samples.extend(local_samples)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(number,)) for number in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - started
@@ -0,0 +1,77 @@
+"""
+Review comment sanitizer benchmark.
+
+Times ``sanitize_comment`` against ``bleach.clean``, which it must match,
+on typical comments (short plain text, light markup) and adversarial ones
+(long, markup-heavy, or at the length limit), then a batch of comments
+through ``sanitize_comments``.
+
+Examples::
+
+    python -m benchmarks.sanitizer
+    python -m benchmarks.sanitizer --repeat 5 --output sanitizer.json
+"""
+import argparse
+import sys
+import timeit
+
+import bleach
+
+from benchmarks.report import build_report, save_report
+from reviews_service.sanitizer import sanitize_comment, sanitize_comments
+
+CASES = {
+    'plain_short': "Great room, the projector works fine.",
+    'plain_long': "Quiet and spacious room with good lighting. " * 100,
+    'light_markup': "This is a great room! <b>Bold</b> & tidy",
+    'script_tag': "This is a great room! <script>alert('xss')</script> <b>Bold</b>",
+    'nested_tags': "<div>" * 500 + "text" + "</div>" * 500,
+    'entity_flood': "&amp;&lt;&gt;" * 400,
+    'unclosed_tags': "<a href='x' " * 400,
+}
+BATCH = [CASES['plain_short'], CASES['light_markup']] * 500
+
+
+def best_time(run, number, repeat):
+    """
+    Returns the fastest of ``repeat`` timings of ``number`` calls, per call.
+
+    :return: Microseconds per call.
+    :rtype: float
+    """
+    return min(timeit.repeat(run, number=number, repeat=repeat)) / number * 1e6
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.sanitizer', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=3, help='Timings per case, the fastest is reported (default 3)')
+    parser.add_argument('--output', help='Save the results as JSON')
+    args = parser.parse_args(argv)
+
+    results = {}
+    print(f"{'case':<15} {'chars':>6} {'bleach us':>10} {'sanitize us':>12} {'speedup':>8}")
+    for name, comment in CASES.items():
+        if sanitize_comment(comment) != bleach.clean(comment):
+            sys.exit(f"sanitize_comment and bleach.clean disagree on {name}")
+        number = 2000 if len(comment) < 1000 else 50
+        baseline = best_time(lambda: bleach.clean(comment), number, args.repeat)
+        optimized = best_time(lambda: sanitize_comment(comment), number, args.repeat)
+        results[name] = {'chars': len(comment), 'bleach_us': round(baseline, 1),
+                         'sanitize_us': round(optimized, 1), 'speedup': round(baseline / optimized, 2)}
+        print(f"{name:<15} {len(comment):>6} {baseline:>10.1f} {optimized:>12.1f} {baseline / optimized:>7.1f}x")
+
+    baseline = best_time(lambda: [bleach.clean(comment) for comment in BATCH], 1, args.repeat)
+    optimized = best_time(lambda: sanitize_comments(BATCH), 1, args.repeat)
+    results[f"batch_{len(BATCH)}"] = {'bleach_us': round(baseline, 1), 'sanitize_us': round(optimized, 1),
+                                      'speedup': round(baseline / optimized, 2)}
+    print(f"\nbatch of {len(BATCH)}: bleach.clean {baseline / 1000:.1f} ms, "
+          f"sanitize_comments {optimized / 1000:.1f} ms")
+
+    if args.output:
+        save_report(build_report(results, {'repeat': args.repeat}), args.output)
+        print(f"\nSaved results to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,167 @@
+from datetime import datetime, timedelta
+
+SCENARIOS = {}
+
+BASE_TIME = datetime(2030, 1, 1, 8, 0, 0)
+ADMIN_HEADERS = {'X-User-Role': 'admin', 'X-User-ID': '1', 'X-User-Name': 'bench_admin'}
+BENCH_ROOMS = 200
+# Owner of the bookings written by create_booking, so they can be told apart
+BENCH_USER_ID = 424242
+BENCH_BOOKING_ROOM = 999
+REVIEWED_ROOMS = range(900, 910)
+REVIEWS_PER_ROOM = 10
+# Rooms reviewed by submit_review, kept apart from the seeded ones
+SUBMITTED_REVIEW_ROOMS = range(950, 960)
+
+
+class Scenario:
+    """
+    A named workload against one service.
+
+    ``make_request(worker, iteration)`` returns the next request of a worker
+    as a dict with ``method``, ``path`` and optionally ``json`` and
+    ``headers``. ``setup(target)`` runs once before the measurement to seed
+    data, through the target's ``send`` and ``fetch`` methods. Seeding must
+    be idempotent, so every run measures the same dataset.
+
+    :param service: Service name, e.g. ``rooms``.
+    :type service: str
+    :param name: Scenario name, unique across services.
+    :type name: str
+    :param make_request: Builds the request of one iteration.
+    :type make_request: callable
+    :param setup: Optional seeding step.
+    :type setup: callable
+    """
+
+    def __init__(self, service, name, make_request, setup=None):
+        self.service = service
+        self.name = name
+        self.make_request = make_request
+        self.setup = setup
+
+def scenario(service, name, setup=None):
+    """
+    Registers a request builder as a scenario.
+
+    :param service: Service name.
+    :type service: str
+    :param name: Scenario name.
+    :type name: str
+    :param setup: Optional seeding step.
+    :type setup: callable
+    :return: Decorator.
+    :rtype: callable
+    """
+    def register(make_request):
+        SCENARIOS[name] = Scenario(service, name, make_request, setup)
+        return make_request
+    return register
+
+def booking_window(worker, iteration):
+    """
+    Returns a one hour window unique to a worker and iteration.
+
+    :return: ISO start and end times.
+    :rtype: tuple
+    """
+    start = BASE_TIME + timedelta(days=worker * 1000, hours=iteration)
+    return start.isoformat(), (start + timedelta(hours=1)).isoformat()
+
+# Rooms
+
+def seed_rooms(target):
+    """Upserts the bench rooms, matched by name, so reruns update rather than add them."""
+    _, listing = target.fetch('GET', '/rooms')
+    existing = {room['name']: room['id'] for room in listing or []}
+    rows = []
+    for i in range(BENCH_ROOMS):
+        row = {"name": f"Bench Room {i}", "capacity": 4 + i % 20,
+               "equipment": "Projector,Whiteboard" if i % 2 else "TV", "location": f"Building {'ABC'[i % 3]}"}
+        if row['name'] in existing:
+            row['id'] = existing[row['name']]
+        rows.append(row)
+    target.send('PUT', '/rooms/bulk', json={"rooms": rows}, headers=ADMIN_HEADERS)
+
+@scenario('rooms', 'list_rooms', setup=seed_rooms)
+def list_rooms(worker, iteration):
+    return {'method': 'GET', 'path': f"/rooms?capacity={5 + iteration % 10}"}
+
+@scenario('rooms', 'rooms_by_rating', setup=seed_rooms)
+def rooms_by_rating(worker, iteration):
+    return {'method': 'GET', 'path': '/rooms?sort=rating'}
+
+@scenario('rooms', 'available_rooms', setup=seed_rooms)
+def available_rooms(worker, iteration):
+    start, end = booking_window(0, iteration % 24)
+    return {'method': 'GET', 'path': f"/rooms/available?start_time={start}&end_time={end}&capacity=8"}
+
+# Bookings
+
+def clear_bench_bookings(target):
+    """Cancels the bookings left by earlier create_booking runs, which would otherwise conflict."""
+    _, bookings = target.fetch('GET', f"/bookings?user_id={BENCH_USER_ID}")
+    for booking in bookings or []:
+        target.send('DELETE', f"/bookings/cancel/{booking['id']}", headers={'X-User-ID': str(BENCH_USER_ID)})
+
+@scenario('bookings', 'create_booking', setup=clear_bench_bookings)
+def create_booking(worker, iteration):
+    start, end = booking_window(worker, iteration)
+    return {'method': 'POST', 'path': '/bookings',
+            'json': {"user_id": BENCH_USER_ID, "room_id": BENCH_BOOKING_ROOM, "start_time": start, "end_time": end}}
+
+@scenario('bookings', 'check_availability')
+def check_availability(worker, iteration):
+    start, end = booking_window(worker, iteration % 50)
+    return {'method': 'POST', 'path': '/bookings/check',
+            'json': {"room_id": BENCH_BOOKING_ROOM, "start_time": start, "end_time": end}}
+
+# Reviews
+
+def seed_reviews(target):
+    """Tops each reviewed room up to REVIEWS_PER_ROOM reviews."""
+    for room_id in REVIEWED_ROOMS:
+        _, summary = target.fetch('GET', f"/api/v1/analytics/room/{room_id}")
+        for i in range((summary or {}).get('review_count', 0), REVIEWS_PER_ROOM):
+            target.send('POST', '/reviews', json={"user_id": i, "room_id": room_id, "rating": 1 + i % 5,
+                                                  "comment": f"Review {i}: the projector works & the chairs are fine"})
+
+def clear_submitted_reviews(target):
+    """Deletes the reviews written by earlier submit_review runs."""
+    for room_id in SUBMITTED_REVIEW_ROOMS:
+        while True:
+            _, reviews = target.fetch('GET', f"/reviews/room/{room_id}?limit=200")
+            if not reviews:
+                break
+            for review in reviews:
+                target.send('DELETE', f"/reviews/{review['id']}", headers=ADMIN_HEADERS)
+
+@scenario('reviews', 'submit_review', setup=clear_submitted_reviews)
+def submit_review(worker, iteration):
+    return {'method': 'POST', 'path': '/reviews',
+            'json': {"user_id": worker, "room_id": SUBMITTED_REVIEW_ROOMS[iteration % 10], "rating": 1 + iteration % 5,
+                     "comment": "Great room, <b>quiet</b> and bright"}}
+
+@scenario('reviews', 'room_reviews', setup=seed_reviews)
+def room_reviews(worker, iteration):
+    return {'method': 'GET', 'path': f"/reviews/room/{REVIEWED_ROOMS[iteration % 10]}?limit=20"}
+
+@scenario('reviews', 'search_reviews', setup=seed_reviews)
+def search_reviews(worker, iteration):
+    return {'method': 'GET', 'path': '/reviews/search?q=projector'}
+
+# Users
+
+def seed_users(target):
+    # Registering an existing user fails, so reruns leave the table as is
+    target.send('POST', '/users/register', json={"full_name": "Bench User", "username": "bench_user",
+                                                 "email": "bench@example.com", "password": "bench-pass", "role": "user"})
+
+@scenario('users', 'login', setup=seed_users)
+def login(worker, iteration):
+    return {'method': 'POST', 'path': '/users/login',
+            'json': {"username": "bench_user", "password": "bench-pass"}}
+
+@scenario('users', 'get_user', setup=seed_users)
+def get_user(worker, iteration):
+    return {'method': 'GET', 'path': '/users/bench_user'}
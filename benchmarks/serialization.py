@@ -0,0 +1,135 @@
+"""
+Serialization benchmark for the booking and room listings.
+
+For each row count it times three ways of turning the first N rows into a
+JSON body:
+
+- ``orm+to_dict+stdlib``: ORM objects, ``to_dict()`` per row and Flask's
+  default provider, as the listings used to do;
+- ``columns+stdlib``: column tuples from ``row_dicts`` and the standard
+  library encoder (the fallback when orjson is not installed);
+- ``columns+orjson``: column tuples and ``FastJSONProvider`` with orjson.
+
+The tables are topped up with generated rows when they hold fewer than the
+largest row count.
+
+Examples::
+
+    python -m benchmarks.serialization
+    python -m benchmarks.serialization --rows 10000 --rows 100000 --repeat 5 --output serialization.json
+"""
+import argparse
+import json
+import sys
+import time
+
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import text
+
+from benchmarks.dataset import generate_bookings, generate_rooms, id_range, load_table
+from benchmarks.report import build_report, percentile, save_report
+from benchmarks.runner import load_services
+from common.json_provider import USE_ORJSON, default, row_dicts
+
+
+def top_up(engine, table, rows):
+    """
+    Adds generated rows until a table holds at least ``rows`` rows.
+
+    :param engine: SQLAlchemy engine.
+    :param table: ``bookings`` or ``rooms``.
+    :type table: str
+    :param rows: Wanted row count.
+    :type rows: int
+    """
+    with engine.connect() as connection:
+        last_id, count = id_range(connection, table)
+        room_ids = connection.execute(text("SELECT coalesce(max(id), 1) FROM rooms")).scalar()
+    if count >= rows:
+        return
+    if table == 'rooms':
+        generated = generate_rooms(last_id + 1, rows - count, seed=7)
+    else:
+        generated = generate_bookings(last_id + 1, rows - count, 7, (1, max(room_ids, rows // 50)), (1, 1000))
+    load_table(engine, table, generated, 50000)
+
+def time_variant(build, repeat):
+    """
+    Runs a body builder ``repeat`` times.
+
+    :param build: Returns the serialized body.
+    :type build: callable
+    :return: Median milliseconds and the body size in bytes.
+    :rtype: tuple
+    """
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = build()
+        timings.append((time.perf_counter() - started) * 1000)
+    size = len(body.encode() if isinstance(body, str) else body)
+    return percentile(sorted(timings), 0.5), size
+
+def variants(module, model, rows):
+    """
+    Returns the body builders compared for one listing.
+
+    :param module: The service's app module.
+    :param model: ``Booking`` or ``Room``.
+    :param rows: Number of rows to serialize.
+    :type rows: int
+    :rtype: dict
+    """
+    app = module.app
+    legacy = DefaultJSONProvider(app)
+
+    def orm_to_dict():
+        return legacy.dumps([item.to_dict() for item in model.query.order_by(model.id).limit(rows)])
+
+    def columns_stdlib():
+        listing = row_dicts(model.query.with_entities(*model.columns()).order_by(model.id).limit(rows))
+        return json.dumps(listing, default=default, separators=(',', ':'))
+
+    def columns_orjson():
+        listing = row_dicts(model.query.with_entities(*model.columns()).order_by(model.id).limit(rows))
+        return app.json.dumps_bytes(listing)
+
+    return {'orm+to_dict+stdlib': orm_to_dict, 'columns+stdlib': columns_stdlib, 'columns+orjson': columns_orjson}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.serialization', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, action='append', help='Row count, may be repeated (default 10000 and 100000)')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per variant, the median is reported (default 5)')
+    parser.add_argument('--output', help='Save the results as JSON')
+    args = parser.parse_args(argv)
+    sizes = sorted(args.rows or [10000, 100000])
+
+    modules = load_services()
+    listings = {'bookings': (modules['bookings'], modules['bookings'].Booking),
+                'rooms': (modules['rooms'], modules['rooms'].Room)}
+    if not USE_ORJSON:
+        print("orjson is not installed, columns+orjson falls back to the standard library")
+
+    results = {}
+    print(f"{'listing':<10} {'rows':>8} {'variant':<20} {'median ms':>10} {'MB':>7} {'speedup':>8}")
+    for table, (module, model) in listings.items():
+        with module.app.app_context():
+            top_up(module.db.engine, table, sizes[-1])
+            for rows in sizes:
+                baseline = None
+                for name, build in variants(module, model, rows).items():
+                    elapsed, size = time_variant(build, args.repeat)
+                    baseline = baseline or elapsed
+                    results[f"{table}/{rows}/{name}"] = {'median_ms': round(elapsed, 2), 'bytes': size}
+                    print(f"{table:<10} {rows:>8} {name:<20} {elapsed:>10.1f} {size / 1e6:>7.2f} "
+                          f"{baseline / elapsed:>7.1f}x")
+
+    if args.output:
+        save_report(build_report(results, {'rows': sizes, 'repeat': args.repeat}), args.output)
+        print(f"\nSaved results to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,96 @@
+"""
+Server benchmark: the Werkzeug development server against gunicorn.
+
+Starts a service under each server in turn, sends one path from concurrent
+keep-alive clients for a fixed time, and stops it again. The development
+server is what ``python -m <service>.app`` runs; gunicorn is the
+``python -m <service>.serve`` entry point, configured through the usual
+``WEB_*`` variables.
+
+Examples::
+
+    python -m benchmarks.servers
+    python -m benchmarks.servers --service rooms --path /rooms --concurrency 32 --duration 20 --output servers.json
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.report import SUMMARY_HEADER, build_report, format_summary, save_report, summarize
+from benchmarks.runner import SERVICE_MODULES, HttpTarget, run_load
+
+# Ports the development servers always listen on, they ignore WEB_BIND
+DEV_SERVER_PORTS = {'users': 5001, 'rooms': 5002, 'bookings': 5003, 'reviews': 5004}
+GUNICORN_PORT = 5099
+
+
+def servers(service):
+    """
+    Returns the servers compared for a service.
+
+    :param service: Service name, e.g. ``bookings``.
+    :type service: str
+    :return: Name to ``(command, port)``.
+    :rtype: dict
+    """
+    package = SERVICE_MODULES[service].split('.')[0]
+    return {
+        'werkzeug': ([sys.executable, '-m', f"{package}.app"], DEV_SERVER_PORTS[service]),
+        'gunicorn': ([sys.executable, '-m', f"{package}.serve"], GUNICORN_PORT),
+    }
+
+def wait_until_up(target, path, timeout=20):
+    """
+    Polls a server until it answers.
+
+    :return: Whether it answered within ``timeout`` seconds.
+    :rtype: bool
+    """
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if target.send('GET', path):
+            return True
+        time.sleep(0.2)
+    return False
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks.servers', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--service', default='bookings', choices=list(SERVICE_MODULES))
+    parser.add_argument('--path', help='Path to request (default the service listing, e.g. /bookings)')
+    parser.add_argument('--concurrency', type=int, default=16, help='Client threads (default 16)')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per server (default 10)')
+    parser.add_argument('--output', help='Save the results as JSON')
+    args = parser.parse_args(argv)
+    path = args.path or f"/{args.service}"
+
+    results = {}
+    print(f"GET {path} on {args.service}, {args.concurrency} clients for {args.duration:.0f}s")
+    print(SUMMARY_HEADER)
+    for name, (command, port) in servers(args.service).items():
+        target = HttpTarget(f"http://127.0.0.1:{port}", timeout=10)
+        env = dict(os.environ, WEB_BIND=f"127.0.0.1:{GUNICORN_PORT}")
+        process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            if not wait_until_up(target, path):
+                print(f"{name:<28} did not start")
+                continue
+            samples, elapsed = run_load(lambda spec: target, lambda worker, iteration: {'method': 'GET', 'path': path},
+                                        args.concurrency, duration=args.duration)
+        finally:
+            process.terminate()
+            process.wait()
+        results[name] = summarize(samples, elapsed)
+        print(format_summary(name, results[name]))
+
+    if args.output:
+        config = {key: value for key, value in vars(args).items() if key != 'output'}
+        save_report(build_report(results, dict(config, path=path)), args.output)
+        print(f"\nSaved results to {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
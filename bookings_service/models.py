@@ -1,5 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from sqlalchemy import table, column
 
 db = SQLAlchemy()
 
@@ -20,7 +21,7 @@ class Booking(db.Model):
     """
     __tablename__ = 'bookings'
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, nullable=False)
+    user_id = db.Column(db.Integer, nullable=False, index=True)
     room_id = db.Column(db.Integer, nullable=False)
     start_time = db.Column(db.DateTime, nullable=False,index=True)
     end_time = db.Column(db.DateTime, nullable=False,index=True)
@@ -38,4 +39,25 @@ class Booking(db.Model):
             "room_id": self.room_id,
             "start_time": self.start_time.isoformat(),
             "end_time": self.end_time.isoformat()
-        }
\ No newline at end of file
+        }
+
+    @classmethod
+    def columns(cls):
+        """
+        Columns returned by :meth:`to_dict`, for listings that select column tuples.
+
+        :return: The mapped columns, in ``to_dict()`` order.
+        :rtype: tuple
+        """
+        return (cls.id, cls.user_id, cls.room_id, cls.start_time, cls.end_time)
+
+# Read-only view of the rooms table owned by the rooms service. It is a
+# lightweight table() so db.create_all() in this service never touches it.
+rooms = table(
+    'rooms',
+    column('id', db.Integer),
+    column('name', db.String),
+    column('capacity', db.Integer),
+    column('equipment', db.String),
+    column('location', db.String)
+)
@@ -1,6 +1,17 @@
+import json
+import logging
+import os
+import subprocess
+import sys
 import pytest
 from datetime import datetime, timedelta
-from bookings_service.app import app, db, Booking
+from sqlalchemy import create_engine, exc, text
+from bookings_service.app import app, db, Booking, EVENT_HANDLERS
+from common.events import DatabaseBus, consume_events, record_event
+from common.json_provider import default
+from common.db_pool import TimedQueuePool, pool_stats, pool_status
+from common.metrics import MetricsRegistry, service_metrics
+from common.query_tracker import fingerprint, normalize_statement
 
 @pytest.fixture
 def client():
@@ -72,3 +83,226 @@ def test_cancel_booking(client):
     response = client.delete(f'/bookings/cancel/{booking_id}')
     assert response.status_code == 200
     assert "cancelled" in response.json['message']
+
+def test_conflict_suggests_alternatives(client):
+    """Test API: A conflicting booking suggests free similar rooms and the next free slot"""
+    with app.app_context():
+        # The rooms table belongs to the rooms service, whose init-db may not have run
+        db.session.execute(text(
+            "CREATE TABLE IF NOT EXISTS rooms (id INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL, "
+            "capacity INTEGER NOT NULL, equipment VARCHAR(200), location VARCHAR(100) NOT NULL)"
+        ))
+        Booking.query.filter(Booking.room_id.in_([9001, 9002])).delete()
+        db.session.execute(text("DELETE FROM rooms WHERE id IN (9001, 9002, 9003)"))
+        db.session.execute(text(
+            "INSERT INTO rooms (id, name, capacity, equipment, location) VALUES "
+            "(9001, 'Alt Target', 8, 'None', 'Building Z'), "
+            "(9002, 'Alt Match', 10, 'None', 'Building Z'), "
+            "(9003, 'Alt Too Small', 4, 'None', 'Building Z')"
+        ))
+        db.session.commit()
+
+    for hour in (10, 11):
+        client.post('/bookings', json={
+            "user_id": 1,
+            "room_id": 9001,
+            "start_time": datetime(2032, 1, 1, hour).isoformat(),
+            "end_time": datetime(2032, 1, 1, hour + 1).isoformat()
+        })
+
+    response = client.post('/bookings', json={
+        "user_id": 2,
+        "room_id": 9001,
+        "start_time": datetime(2032, 1, 1, 10).isoformat(),
+        "end_time": datetime(2032, 1, 1, 11).isoformat(),
+        "alternatives": 3
+    })
+    assert response.status_code == 409
+    alternatives = response.json['alternatives']
+    room_ids = [r['id'] for r in alternatives['rooms']]
+    assert room_ids[0] == 9002
+    assert 9003 not in room_ids
+    assert alternatives['next_free_slot']['start_time'] == "2032-01-01T12:00:00"
+
+    for invalid in ("abc", [1], -1, True):
+        response = client.post('/bookings', json={
+            "user_id": 2,
+            "room_id": 9001,
+            "start_time": datetime(2032, 1, 1, 10).isoformat(),
+            "end_time": datetime(2032, 1, 1, 11).isoformat(),
+            "alternatives": invalid
+        })
+        assert response.status_code == 400
+
+    with app.app_context():
+        Booking.query.filter_by(room_id=9001).delete()
+        db.session.execute(text("DELETE FROM rooms WHERE id IN (9001, 9002, 9003)"))
+        db.session.commit()
+
+def test_audit_queue_overflow_policies():
+    import queue
+    import logging
+    from common.logger import BoundedQueueHandler
+
+    def record(message):
+        return logging.LogRecord('audit_logger', logging.INFO, __file__, 0, message, None, None)
+
+    dropping = BoundedQueueHandler(queue.Queue(maxsize=1), policy='drop')
+    dropping.emit(record("first"))
+    dropping.emit(record("second"))
+    assert dropping.dropped == 1
+    assert dropping.queue.get_nowait().getMessage() == "first"
+
+    evicting = BoundedQueueHandler(queue.Queue(maxsize=1), policy='drop_oldest')
+    evicting.emit(record("first"))
+    evicting.emit(record("second"))
+    assert evicting.dropped == 1
+    assert evicting.queue.get_nowait().getMessage() == "second"
+
+    blocking = BoundedQueueHandler(queue.Queue(maxsize=1), policy='block', block_timeout=0.01)
+    blocking.emit(record("first"))
+    blocking.emit(record("second"))
+    assert blocking.dropped == 1
+
+def test_pool_saturation_metrics(client, tmp_path):
+    """Test: Pool overflow and checkout timeouts are counted"""
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=TimedQueuePool,
+                           pool_size=1, max_overflow=1, pool_timeout=0.1)
+    pool_stats.reset()
+    first, second = engine.connect(), engine.connect()
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+
+    status = pool_status(engine)
+    assert (status['checked_out'], status['overflow']) == (2, 1)
+    assert (status['checkouts'], status['overflow_checkouts'], status['timeouts']) == (2, 1, 1)
+    assert status['max_wait_ms'] >= 100
+    first.close()
+    second.close()
+    engine.dispose()
+
+    assert client.get('/api/v1/pool').status_code == 403
+    response = client.get('/api/v1/pool', headers={'X-User-Role': 'admin'})
+    assert response.status_code == 200
+    assert response.json['pool_class'] == 'TimedQueuePool'
+
+def test_metrics_endpoint(client):
+    """Test API: Request, latency and DB metrics in Prometheus format"""
+    client.get('/bookings')
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain; version=0.0.4')
+    text_format = response.get_data(as_text=True)
+    assert 'http_requests_total{service="bookings_service",method="GET",route="/bookings",status="200"}' in text_format
+    assert 'http_request_duration_seconds_bucket{service="bookings_service",method="GET",route="/bookings",le="+Inf"}' in text_format
+    assert 'http_request_db_queries_count{service="bookings_service",method="GET",route="/bookings"}' in text_format
+    assert 'http_request_db_queries_bucket{service="bookings_service",method="GET",route="/bookings",le="0"} 0' in text_format
+
+def test_metrics_add_up_worker_snapshots(client, tmp_path, monkeypatch):
+    """Test API: With METRICS_DIR, /metrics sums worker snapshots and keeps the counts of exited workers"""
+    monkeypatch.setenv('METRICS_DIR', str(tmp_path))
+    other_worker = MetricsRegistry('bookings_service')
+    other_worker.observe_request('GET', '/bookings', 200, 0.01, 1, 0.001)
+    # The parent process stands in for a live worker, an exited child for a dead one
+    exited = subprocess.Popen([sys.executable, '-c', 'pass'])
+    exited.wait()
+    for pid in (os.getppid(), exited.pid):
+        (tmp_path / f'bookings_service-{pid}-worker.json').write_text(json.dumps(other_worker.snapshot()))
+    (tmp_path / f'rooms_service-{os.getppid()}-worker.json').write_text(json.dumps(other_worker.snapshot()))
+
+    client.get('/bookings')
+    metrics = service_metrics('bookings_service')
+    own = metrics.registry.requests[('GET', '/bookings', 200)]
+    text_format = client.get('/metrics').get_data(as_text=True)
+    sample = 'http_requests_total{service="bookings_service",method="GET",route="/bookings",status="200"}'
+    assert f'{sample} {own + 2}' in text_format
+    # The dead worker's snapshot is folded into the retired counts
+    assert sorted(path.name for path in tmp_path.glob('bookings_service-*.json')) == sorted(
+        [f'bookings_service-{os.getppid()}-worker.json', os.path.basename(metrics.path)])
+    assert f'{sample} {own + 2}' in client.get('/metrics').get_data(as_text=True)
+
+    # An exiting worker moves its counts there too and deletes its snapshot
+    own = metrics.registry.requests[('GET', '/bookings', 200)]
+    metrics.remove()
+    assert not os.path.exists(metrics.path)
+    retired = MetricsRegistry('bookings_service')
+    retired.merge(json.loads((tmp_path / 'bookings_service.retired.json').read_text()))
+    assert retired.requests[('GET', '/bookings', 200)] == own + 1
+    metrics.closed = False
+
+def test_query_tracker_headers_and_repeats(client, caplog):
+    """Test API: Per-request query counts and N+1 warnings"""
+    app.config.update(QUERY_TRACKING=True, QUERY_TRACKING_HEADERS=True)
+    try:
+        response = client.get('/bookings')
+        assert response.headers['X-DB-Queries'] == '1'
+        assert float(response.headers['X-DB-Time']) >= 0
+
+        with caplog.at_level(logging.WARNING, logger='query_tracker'):
+            with app.test_request_context('/bookings/loop'):
+                app.preprocess_request()
+                for room_id in range(6):
+                    db.session.execute(text("SELECT id FROM bookings WHERE room_id = :room_id"), {"room_id": room_id})
+                app.process_response(app.response_class())
+        assert 'possible N+1' in caplog.text
+        assert fingerprint("SELECT id FROM bookings WHERE room_id = ?") in caplog.text
+
+        query = "SELECT * FROM bookings WHERE room_id = 5 AND id IN (1, 2, 3)"
+        assert normalize_statement(query) == "SELECT * FROM bookings WHERE room_id = ? AND id IN (?)"
+        assert fingerprint(query) == fingerprint("SELECT * FROM bookings WHERE room_id = 7 AND id IN (4)")
+    finally:
+        app.config.update(QUERY_TRACKING=False, QUERY_TRACKING_HEADERS=False)
+
+def test_json_provider_and_column_listing(client):
+    """Test API: Column-tuple listings serialize like to_dict()"""
+    with app.app_context():
+        Booking.query.filter_by(room_id=998).delete()
+        booking = Booking(user_id=3, room_id=998, start_time=datetime(2026, 3, 1, 9, 0, 0, 250000),
+                          end_time=datetime(2026, 3, 1, 10, 0, 0))
+        db.session.add(booking)
+        db.session.commit()
+        expected = booking.to_dict()
+
+    listed = [b for b in client.get('/bookings').json if b['room_id'] == 998]
+    assert listed == [expected]
+    assert listed[0]['start_time'] == '2026-03-01T09:00:00.250000'
+
+    body = app.json.dumps({"at": datetime(2026, 3, 1, 9, 0), 1: "int key"})
+    assert app.json.loads(body) == {"at": "2026-03-01T09:00:00", "1": "int key"}
+    assert default(datetime(2026, 3, 1)) == '2026-03-01T00:00:00'
+    with pytest.raises(TypeError):
+        default(object())
+
+def test_room_deleted_event_removes_bookings(client):
+    """Test events: A committed room.deleted event removes the room's bookings, at least once"""
+    class Crash(BaseException):
+        pass
+
+    def crash(event):
+        raise Crash()
+
+    with app.app_context():
+        app.extensions['event_bus'] = DatabaseBus(db.engine)
+        try:
+            Booking.query.filter(Booking.room_id.in_([996, 997])).delete()
+            for room_id in (997, 997, 996):
+                db.session.add(Booking(user_id=4, room_id=room_id, start_time=datetime(2026, 4, 1, 9, 0),
+                                       end_time=datetime(2026, 4, 1, 10, 0)))
+            db.session.commit()
+            # Rolled back with the change it describes, so never delivered
+            record_event('room.deleted', {'id': 996})
+            db.session.rollback()
+            record_event('room.deleted', {'id': 997})
+            db.session.commit()
+
+            # The consumer dies mid-batch: nothing is acknowledged
+            with pytest.raises(Crash):
+                consume_events({'room.deleted': crash}, group='bookings_test', once=True)
+            assert Booking.query.filter_by(room_id=997).count() == 2
+
+            assert consume_events(EVENT_HANDLERS, group='bookings_test', once=True) >= 1
+            assert Booking.query.filter_by(room_id=997).count() == 0
+            assert Booking.query.filter_by(room_id=996).count() == 1
+            assert consume_events(EVENT_HANDLERS, group='bookings_test', once=True) == 0
+        finally:
+            app.extensions.pop('event_bus')
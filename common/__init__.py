@@ -0,0 +1,4 @@
+"""
+Code shared by every service. It is imported from the repository root,
+which is on ``sys.path`` when a service runs as ``python -m <service>.serve``.
+"""
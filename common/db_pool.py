@@ -0,0 +1,156 @@
+import os
+import threading
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.pool import QueuePool
+
+
+def env_flag(name, default):
+    """
+    Reads a boolean setting from the environment.
+
+    :param name: Name of the environment variable.
+    :type name: str
+    :param default: Value used when the variable is not set.
+    :type default: bool
+    :return: The setting.
+    :rtype: bool
+    """
+    value = os.environ.get(name)
+    return default if value is None else value.lower() in ('1', 'true', 'yes', 'on')
+
+class PoolStats:
+    """
+    Counts connection checkouts of this process, thread-safe.
+
+    Kept outside the pool because SQLAlchemy replaces the pool object when
+    the engine is disposed (e.g. after a fork).
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Sets every counter back to zero."""
+        with self.lock:
+            self.checkouts = 0
+            self.overflow_checkouts = 0
+            self.timeouts = 0
+            self.wait_seconds = 0.0
+            self.max_wait_seconds = 0.0
+
+    def record(self, waited, overflowed=False, timed_out=False):
+        """
+        Records one checkout attempt.
+
+        :param waited: Seconds spent waiting for a connection.
+        :type waited: float
+        :param overflowed: Whether an overflow connection had to be opened.
+        :type overflowed: bool
+        :param timed_out: Whether the wait ended in a pool timeout.
+        :type timed_out: bool
+        """
+        with self.lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+                self.overflow_checkouts += overflowed
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+
+    def to_dict(self):
+        """
+        Returns the counters.
+
+        :return: Checkouts, overflow checkouts, timeouts and wait times in milliseconds.
+        :rtype: dict
+        """
+        with self.lock:
+            attempts = self.checkouts + self.timeouts
+            return {
+                'checkouts': self.checkouts,
+                'overflow_checkouts': self.overflow_checkouts,
+                'timeouts': self.timeouts,
+                'total_wait_ms': round(self.wait_seconds * 1000, 3),
+                'avg_wait_ms': round(self.wait_seconds * 1000 / attempts, 3) if attempts else 0.0,
+                'max_wait_ms': round(self.max_wait_seconds * 1000, 3),
+            }
+
+pool_stats = PoolStats()
+
+class TimedQueuePool(QueuePool):
+    """
+    A QueuePool that reports checkout wait times, overflows and timeouts to :data:`pool_stats`.
+    """
+
+    def _do_get(self):
+        overflow_before = max(self.overflow(), 0)
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            pool_stats.record(time.perf_counter() - start, timed_out=True)
+            raise
+        pool_stats.record(time.perf_counter() - start, overflowed=self.overflow() > overflow_before)
+        return connection
+
+def engine_options(db_url):
+    """
+    Builds the SQLAlchemy engine options from the environment.
+
+    - DB_POOL_SIZE: connections kept open per process (default 5).
+    - DB_MAX_OVERFLOW: extra connections opened under load (default 10).
+    - DB_POOL_TIMEOUT: seconds to wait for a free connection (default 30).
+    - DB_POOL_RECYCLE: seconds after which a connection is replaced (default 1800).
+    - DB_POOL_PRE_PING: test connections before use (default on).
+    - DB_STATEMENT_TIMEOUT_MS: Postgres statement timeout (default 0, off).
+
+    :param db_url: The database URL.
+    :type db_url: str
+    :return: Options for ``SQLALCHEMY_ENGINE_OPTIONS``.
+    :rtype: dict
+    """
+    url = make_url(db_url)
+    if url.get_backend_name() == 'sqlite' and url.database in (None, '', ':memory:'):
+        # In-memory databases live in a single connection
+        return {}
+
+    options = {
+        'poolclass': TimedQueuePool,
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 5)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 10)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 1800)),
+        'pool_pre_ping': env_flag('DB_POOL_PRE_PING', True),
+    }
+    statement_timeout = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 0))
+    if statement_timeout and url.get_backend_name() == 'postgresql':
+        options['connect_args'] = {'options': f"-c statement_timeout={statement_timeout}"}
+    return options
+
+def pool_status(engine):
+    """
+    Returns the live state of an engine's pool and the checkout counters.
+
+    :param engine: The SQLAlchemy engine.
+    :type engine: sqlalchemy.engine.Engine
+    :return: Pool size, checked out/in and overflow connections, plus :class:`PoolStats` counters.
+    :rtype: dict
+    """
+    pool = engine.pool
+    status = {'pool_class': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'checked_in': pool.checkedin(),
+            'overflow': max(pool.overflow(), 0),
+            'max_overflow': pool._max_overflow,
+            'timeout_seconds': pool.timeout(),
+        })
+    status.update(pool_stats.to_dict())
+    return status
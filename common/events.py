@@ -0,0 +1,457 @@
+"""
+Domain events shared by the services: an outbox written in the same
+transaction as the change, and consumer groups applying other services'
+events to their own data.
+"""
+import json
+import logging
+import os
+import select
+import socket
+import time
+from datetime import datetime, timezone
+from fnmatch import fnmatchcase
+
+from flask import current_app
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, Text, func, insert, select as sql_select, text
+from sqlalchemy.exc import IntegrityError
+
+EVENT_STREAM = os.environ.get('EVENT_STREAM', 'domain_events')
+# Events kept in the stream (Redis MAXLEN) or, once acknowledged, in the events table
+EVENT_RETENTION = int(os.environ.get('EVENT_RETENTION', 100000))
+EVENT_BATCH_SIZE = int(os.environ.get('EVENT_BATCH_SIZE', 100))
+EVENT_BLOCK_SECONDS = float(os.environ.get('EVENT_BLOCK_SECONDS', 5))
+# Same setting as the rooms cache client
+REDIS_CONNECT_TIMEOUT = float(os.environ.get('REDIS_CONNECT_TIMEOUT', 1))
+# Pending Redis entries idle this long are taken over from a consumer that died
+EVENT_CLAIM_IDLE_SECONDS = float(os.environ.get('EVENT_CLAIM_IDLE_SECONDS', 60))
+# Attempts per event before it is logged as dead and skipped
+EVENT_MAX_ATTEMPTS = int(os.environ.get('EVENT_MAX_ATTEMPTS', 5))
+# Database bus group whose offset marks the outbox rows already pushed to the Redis Stream
+RELAY_GROUP = 'stream_relay'
+
+event_logger = logging.getLogger('events')
+
+event_metadata = MetaData()
+domain_events = Table(
+    'domain_events', event_metadata,
+    Column('id', Integer, primary_key=True),
+    Column('type', String(100), nullable=False),
+    Column('source', String(100), nullable=False),
+    Column('occurred_at', DateTime, nullable=False),
+    Column('data', Text, nullable=False),
+)
+event_offsets = Table(
+    'event_offsets', event_metadata,
+    Column('group_name', String(100), primary_key=True),
+    Column('last_event_id', Integer, nullable=False, default=0),
+)
+
+
+def build_event(event_type, data, source):
+    """
+    Wraps a payload in the event envelope.
+
+    :param event_type: Dotted event name, e.g. ``room.deleted``.
+    :type event_type: str
+    :param data: JSON-serializable payload.
+    :type data: dict
+    :param source: Name of the publishing service.
+    :type source: str
+    :return: Event with ``type``, ``source``, ``occurred_at`` and ``data``.
+    :rtype: dict
+    """
+    return {
+        'type': event_type,
+        'source': source,
+        'occurred_at': datetime.now(timezone.utc).isoformat(),
+        'data': data,
+    }
+
+class RedisStreamBus:
+    """
+    Event bus on a Redis Stream with one consumer group per service.
+
+    Entries stay pending in their group until acknowledged. Entries left
+    pending by a consumer that died are claimed by another consumer of the
+    group once idle for ``EVENT_CLAIM_IDLE_SECONDS``, so every event is
+    delivered at least once.
+
+    :param client: Redis client.
+    :type client: redis.Redis
+    :param stream: Stream key.
+    :type stream: str
+    """
+
+    def __init__(self, client, stream=EVENT_STREAM):
+        self.client = client
+        self.stream = stream
+        self.groups = set()
+
+    def publish(self, events):
+        pipe = self.client.pipeline(transaction=False)
+        for event in events:
+            pipe.xadd(self.stream, {
+                'type': event['type'],
+                'source': event['source'],
+                'occurred_at': event['occurred_at'],
+                'data': json.dumps(event['data']),
+            }, maxlen=EVENT_RETENTION, approximate=True)
+        pipe.execute()
+
+    def _ensure_group(self, group):
+        if group in self.groups:
+            return
+        try:
+            # From the start of the stream, so events published before the group existed are not missed
+            self.client.xgroup_create(self.stream, group, id='0', mkstream=True)
+        except Exception as e:
+            if 'BUSYGROUP' not in str(e):
+                raise
+        self.groups.add(group)
+
+    @staticmethod
+    def _decode(message_id, fields):
+        fields = {key.decode() if isinstance(key, bytes) else key: value.decode() if isinstance(value, bytes) else value
+                  for key, value in fields.items()}
+        return {
+            'id': message_id.decode() if isinstance(message_id, bytes) else message_id,
+            'type': fields['type'],
+            'source': fields['source'],
+            'occurred_at': fields['occurred_at'],
+            'data': json.loads(fields['data']),
+        }
+
+    def read(self, group, consumer, count, block_seconds):
+        """
+        Claims stale pending entries, or else waits for new ones.
+
+        :return: A receipt for :meth:`ack` and the events.
+        :rtype: tuple
+        """
+        self._ensure_group(group)
+        claimed = self.client.xautoclaim(self.stream, group, consumer, int(EVENT_CLAIM_IDLE_SECONDS * 1000),
+                                         start_id='0-0', count=count)
+        messages = claimed[1]
+        if not messages:
+            response = self.client.xreadgroup(group, consumer, {self.stream: '>'}, count=count,
+                                              block=int(block_seconds * 1000))
+            messages = response[0][1] if response else []
+        # Entries trimmed while pending come back without fields; they are only acknowledged
+        events = [self._decode(message_id, fields) for message_id, fields in messages if fields]
+        return [message_id for message_id, _ in messages], events
+
+    def ack(self, group, receipt):
+        if receipt:
+            self.client.xack(self.stream, group, *receipt)
+
+    def release(self, group, receipt):
+        """Leaves the entries pending; they are claimed again once idle."""
+
+class DatabaseBus:
+    """
+    Event bus on the shared database, used when Redis is not configured.
+
+    Events are rows of ``domain_events``. Each consumer group keeps the ID
+    of its last processed event in ``event_offsets``. A batch is read while
+    holding that row locked, and the offset only moves once the batch is
+    acknowledged, so a consumer that fails or dies leaves the batch to be
+    read again (at least once).
+
+    Offsets only work if no event can commit after a later ID is visible,
+    or the group would move past it. :func:`write_events` makes sure of it.
+
+    On Postgres, consumers wait on ``LISTEN`` and the inserting transaction
+    sends a ``NOTIFY``. Other databases are polled.
+
+    :param engine: SQLAlchemy engine.
+    """
+
+    def __init__(self, engine, channel=EVENT_STREAM):
+        self.engine = engine
+        self.channel = channel
+        self.postgres = engine.dialect.name == 'postgresql'
+        self.listener = None
+
+    def read(self, group, consumer, count, block_seconds):
+        """
+        Locks the group's offset and reads the next events.
+
+        The lock is held until :meth:`ack` or :meth:`release`, so consumers
+        of the same group take turns.
+
+        :return: A receipt for :meth:`ack` and the events.
+        :rtype: tuple
+        """
+        events = self._read_batch(group, count)
+        if events[1] or block_seconds <= 0:
+            return events
+        self.release(group, events[0])
+        self._wait(block_seconds)
+        return self._read_batch(group, count)
+
+    def _read_batch(self, group, count):
+        connection = self.engine.connect()
+        try:
+            transaction = connection.begin()
+            offset = connection.execute(
+                sql_select(event_offsets.c.last_event_id).where(event_offsets.c.group_name == group).with_for_update()
+            ).scalar()
+            if offset is None:
+                # Registered in its own transaction, so no write lock is held while the batch is handled
+                try:
+                    connection.execute(insert(event_offsets).values(group_name=group, last_event_id=0))
+                    transaction.commit()
+                except IntegrityError:
+                    pass  # Another consumer of the group registered it first
+                connection.close()
+                return self._read_batch(group, count)
+            rows = connection.execute(
+                sql_select(domain_events).where(domain_events.c.id > offset).order_by(domain_events.c.id).limit(count)
+            ).all()
+        except Exception:
+            connection.close()
+            raise
+        events = [{
+            'id': row.id,
+            'type': row.type,
+            'source': row.source,
+            'occurred_at': row.occurred_at.isoformat(),
+            'data': json.loads(row.data),
+        } for row in rows]
+        return (connection, transaction, events[-1]['id'] if events else None), events
+
+    def ack(self, group, receipt):
+        connection, transaction, last_id = receipt
+        try:
+            if last_id is not None:
+                connection.execute(event_offsets.update().where(event_offsets.c.group_name == group)
+                                   .values(last_event_id=last_id))
+                # Keep EVENT_RETENTION events behind the slowest group
+                slowest = connection.execute(sql_select(func.min(event_offsets.c.last_event_id))).scalar()
+                connection.execute(domain_events.delete().where(domain_events.c.id <= slowest - EVENT_RETENTION))
+            transaction.commit()
+        finally:
+            connection.close()
+
+    def release(self, group, receipt):
+        connection, transaction, _ = receipt
+        try:
+            transaction.rollback()
+        finally:
+            connection.close()
+
+    def _wait(self, timeout):
+        if not self.postgres:
+            time.sleep(min(timeout, 1.0))
+            return
+        if self.listener is None:
+            self.listener = self.engine.raw_connection()
+            self.listener.driver_connection.autocommit = True
+            self.listener.cursor().execute(f'LISTEN "{self.channel}"')
+        listener = self.listener.driver_connection
+        if select.select([listener], [], [], timeout)[0]:
+            listener.poll()
+            listener.notifies.clear()
+
+def write_events(connection, events, channel=EVENT_STREAM):
+    """
+    Inserts events into ``domain_events`` within the connection's transaction.
+
+    On Postgres, concurrent inserts take sequence values in one order and may
+    commit in another, which would let a consumer move its offset past an
+    event still to commit. The transaction therefore takes an advisory lock
+    first, held until it ends: IDs are assigned and committed one transaction
+    at a time. Other databases already serialize writers. IDs of rolled-back
+    inserts are simply never seen.
+
+    :param connection: SQLAlchemy connection, inside the transaction to join.
+    :param events: Events from :func:`build_event`.
+    :type events: list
+    :param channel: ``NOTIFY`` channel of the waiting consumers.
+    :type channel: str
+    """
+    rows = [{
+        'type': event['type'],
+        'source': event['source'],
+        'occurred_at': datetime.fromisoformat(event['occurred_at']).replace(tzinfo=None),
+        'data': json.dumps(event['data']),
+    } for event in events]
+    postgres = connection.dialect.name == 'postgresql'
+    if postgres:
+        connection.execute(text("SELECT pg_advisory_xact_lock(hashtext(:channel))"), {'channel': channel})
+    connection.execute(insert(domain_events), rows)
+    if postgres:
+        # Delivered at commit
+        connection.execute(text("SELECT pg_notify(:channel, '')"), {'channel': channel})
+
+def init_events(app, db, service):
+    """
+    Chooses the event bus of an app and adds the event tables to its metadata.
+
+    ``EVENT_BUS`` (config or environment) is ``redis``, ``database`` or
+    ``off``. It defaults to ``redis`` when ``REDIS_URL`` is set and to
+    ``database`` otherwise. The bus is created on first use. The event
+    tables are created along with the service's own by ``db.create_all()``.
+
+    :param app: The Flask application.
+    :type app: flask.Flask
+    :param db: The Flask-SQLAlchemy extension, already initialized on ``app``.
+    :type db: flask_sqlalchemy.SQLAlchemy
+    :param service: Service name, e.g. ``rooms_service``: the source of its events and its consumer group.
+    :type service: str
+    """
+    app.config.setdefault('EVENT_SERVICE', service)
+    app.config.setdefault('EVENT_BUS', os.environ.get('EVENT_BUS', 'redis' if os.environ.get('REDIS_URL') else 'database'))
+    app.config.setdefault('EVENT_REDIS_URL', os.environ.get('REDIS_URL', 'redis://localhost:6379/0'))
+    app.extensions['events_db'] = db
+    for table in event_metadata.tables.values():
+        if table.name not in db.metadata.tables:
+            table.to_metadata(db.metadata)
+
+def get_event_bus():
+    """
+    Returns the event bus of the current app, creating it on first use.
+
+    :return: The bus, or None when events are off.
+    :rtype: RedisStreamBus
+    """
+    if 'event_bus' not in current_app.extensions:
+        kind = current_app.config['EVENT_BUS']
+        if kind == 'redis':
+            import redis
+            # Reads block for up to EVENT_BLOCK_SECONDS, so the socket waits a little longer
+            bus = RedisStreamBus(redis.from_url(current_app.config['EVENT_REDIS_URL'],
+                                                socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+                                                socket_timeout=EVENT_BLOCK_SECONDS + REDIS_CONNECT_TIMEOUT))
+        elif kind == 'database':
+            bus = DatabaseBus(current_app.extensions['events_db'].engine)
+        else:
+            bus = None
+        current_app.extensions['event_bus'] = bus
+    return current_app.extensions['event_bus']
+
+def record_event(event_type, data):
+    """
+    Adds a domain event to the current database transaction.
+
+    ``domain_events`` is an outbox: the event commits, or rolls back, with
+    the change it describes, so no committed change loses its event. The
+    database bus reads the table directly. With the Redis bus,
+    :func:`consume_events` relays new rows to the stream. Call it before
+    ``db.session.commit()``.
+
+    :param event_type: Dotted event name, e.g. ``room.deleted``.
+    :type event_type: str
+    :param data: JSON-serializable payload.
+    :type data: dict
+    """
+    if current_app.config['EVENT_BUS'] == 'off':
+        return
+    db = current_app.extensions['events_db']
+    event = build_event(event_type, data, current_app.config['EVENT_SERVICE'])
+    write_events(db.session.connection(), [event])
+
+def relay_events(bus, count=EVENT_BATCH_SIZE):
+    """
+    Pushes the outbox rows not relayed yet to the Redis Stream.
+
+    The relay is a consumer group of the database bus: its offset marks the
+    rows already sent and only moves once they are in the stream. A relay
+    that dies in between sends the batch again, within at-least-once
+    delivery. The consumers of every service relay, taking turns on the
+    offset lock.
+
+    :param bus: The stream.
+    :type bus: RedisStreamBus
+    :param count: Rows per batch.
+    :type count: int
+    :return: Number of events relayed.
+    :rtype: int
+    """
+    outbox = DatabaseBus(current_app.extensions['events_db'].engine)
+    relayed = 0
+    while True:
+        receipt, events = outbox.read(RELAY_GROUP, None, count, 0)
+        try:
+            if events:
+                bus.publish(events)
+        except BaseException:
+            outbox.release(RELAY_GROUP, receipt)
+            raise
+        outbox.ack(RELAY_GROUP, receipt)
+        relayed += len(events)
+        if len(events) < count:
+            return relayed
+
+def handle_event(handlers, event):
+    """
+    Runs every handler whose pattern matches the event type.
+
+    Each handler is tried up to ``EVENT_MAX_ATTEMPTS`` times. An event that
+    keeps failing is logged as dead and skipped so it cannot block its group.
+
+    :param handlers: ``fnmatch`` pattern (e.g. ``review.*``) to handler.
+    :type handlers: dict
+    :param event: The event.
+    :type event: dict
+    """
+    db = current_app.extensions['events_db']
+    for pattern, handler in handlers.items():
+        if not fnmatchcase(event['type'], pattern):
+            continue
+        for attempt in range(1, EVENT_MAX_ATTEMPTS + 1):
+            try:
+                handler(event)
+                db.session.commit()
+                break
+            except Exception as e:
+                db.session.rollback()
+                if attempt == EVENT_MAX_ATTEMPTS:
+                    event_logger.error("Dead event %s %s after %d attempts: %s", event['type'], event['id'], attempt, e)
+                else:
+                    time.sleep(min(2 ** attempt * 0.1, 5))
+
+def consume_events(handlers, group=None, consumer=None, once=False, block_seconds=EVENT_BLOCK_SECONDS):
+    """
+    Applies events to this service's derived data, batch by batch.
+
+    A batch is acknowledged after all of its events were handled. If the
+    process dies first the batch is delivered again, so handlers must be
+    idempotent. With the Redis bus, the outbox is relayed to the stream
+    before each read, so an event reaches the stream within
+    ``block_seconds`` of its commit.
+
+    :param handlers: ``fnmatch`` pattern to handler, see :func:`handle_event`.
+    :type handlers: dict
+    :param group: Consumer group, the service by default; every consumer of a group shares its events.
+    :type group: str
+    :param consumer: Name of this consumer within the group.
+    :type consumer: str
+    :param once: Stop when no events are waiting.
+    :type once: bool
+    :param block_seconds: How long to wait for new events.
+    :type block_seconds: float
+    :return: Number of events processed.
+    :rtype: int
+    """
+    bus = get_event_bus()
+    if bus is None:
+        return 0
+    group = group or current_app.config['EVENT_SERVICE']
+    consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+    processed = 0
+    while True:
+        if isinstance(bus, RedisStreamBus):
+            relay_events(bus)
+        receipt, events = bus.read(group, consumer, EVENT_BATCH_SIZE, 0 if once else block_seconds)
+        try:
+            for event in events:
+                handle_event(handlers, event)
+        except BaseException:
+            bus.release(group, receipt)
+            raise
+        bus.ack(group, receipt)
+        processed += len(events)
+        if once and not events:
+            return processed
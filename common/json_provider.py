@@ -0,0 +1,124 @@
+import dataclasses
+import decimal
+import json
+import os
+import uuid
+from datetime import date, datetime, time
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Set JSON_ENCODER=stdlib to compare against the standard library encoder
+USE_ORJSON = orjson is not None and os.environ.get('JSON_ENCODER', 'orjson') != 'stdlib'
+
+
+def default(value):
+    """
+    Serializes the types neither encoder handles on its own.
+
+    Datetimes use ``isoformat()``, the format ``to_dict()`` methods always
+    returned, instead of Flask's HTTP date format.
+
+    :param value: The object to serialize.
+    :return: A JSON-compatible value.
+    :raises TypeError: If the type is not supported.
+    """
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.asdict(value)
+    if hasattr(value, '__html__'):
+        return str(value.__html__())
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider backed by orjson, with the standard library as a fallback.
+
+    orjson encodes datetimes, dataclasses and UUIDs natively and returns
+    bytes, which responses use as is. Keys keep their insertion order unless
+    ``sort_keys`` is set. Calls with extra ``json.dumps`` arguments go through
+    the standard library.
+    """
+
+    sort_keys = False
+
+    def _orjson_options(self, pretty=False):
+        options = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if pretty:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps_bytes(self, obj, pretty=False):
+        """
+        Serializes an object to UTF-8 encoded JSON.
+
+        :param obj: The object to serialize.
+        :param pretty: Indent the output.
+        :type pretty: bool
+        :return: The JSON document.
+        :rtype: bytes
+        """
+        if USE_ORJSON:
+            return orjson.dumps(obj, default=default, option=self._orjson_options(pretty))
+        return self.dumps(obj, indent=2 if pretty else None).encode()
+
+    def dumps(self, obj, **kwargs):
+        if USE_ORJSON and not kwargs:
+            return orjson.dumps(obj, default=default, option=self._orjson_options()).decode()
+        kwargs.setdefault('default', default)
+        kwargs.setdefault('ensure_ascii', self.ensure_ascii)
+        kwargs.setdefault('sort_keys', self.sort_keys)
+        if kwargs.get('indent') is None:
+            kwargs.setdefault('separators', (',', ':'))
+        return json.dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if USE_ORJSON and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        pretty = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self.dumps_bytes(obj, pretty) + b"\n", mimetype=self.mimetype)
+
+def init_json(app):
+    """
+    Makes ``jsonify`` and ``app.json`` use :class:`FastJSONProvider`.
+
+    :param app: The Flask application.
+    :type app: flask.Flask
+    """
+    app.json_provider_class = FastJSONProvider
+    app.json = FastJSONProvider(app)
+
+def row_dicts(rows):
+    """
+    Turns column tuples into dictionaries keyed by column name.
+
+    List endpoints select only the columns they return, e.g.
+    ``Booking.query.with_entities(*Booking.columns())``, and skip building
+    ORM objects and calling ``to_dict()`` on each of them. Datetimes are left
+    to the JSON provider.
+
+    :param rows: SQLAlchemy ``Row`` objects.
+    :type rows: iterable
+    :return: One dictionary per row.
+    :rtype: list
+    """
+    keys = None
+    result = []
+    for row in rows:
+        if keys is None:
+            keys = row._fields
+        result.append(dict(zip(keys, row)))
+    return result
@@ -0,0 +1,274 @@
+import atexit
+import json
+import logging
+import os
+import queue
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+AUDIT_LOG_FILE = os.environ.get('AUDIT_LOG_FILE', 'audit.log')
+AUDIT_MAX_BYTES = int(os.environ.get('AUDIT_MAX_BYTES', 64 * 1024 * 1024))
+AUDIT_INDEX_INTERVAL = int(os.environ.get('AUDIT_INDEX_INTERVAL', 64 * 1024))
+AUDIT_QUEUE_SIZE = int(os.environ.get('AUDIT_QUEUE_SIZE', 10000))
+# What to do with a record when the queue is full: 'drop' it, 'drop_oldest' to
+# make room for it, or 'block' the request for up to AUDIT_BLOCK_TIMEOUT seconds.
+AUDIT_OVERFLOW_POLICY = os.environ.get('AUDIT_OVERFLOW_POLICY', 'drop')
+AUDIT_BLOCK_TIMEOUT = float(os.environ.get('AUDIT_BLOCK_TIMEOUT', 1.0))
+
+
+class JsonLineFormatter(logging.Formatter):
+    """
+    Formats audit records as one JSON object per line.
+
+    Call sites describe the event through ``extra``, e.g.
+    ``extra={'event': 'booking.created', 'actor': 23, 'entity': 'booking:110'}``.
+    The loggers returned by :func:`setup_logger` add the service.
+    """
+
+    def format(self, record):
+        return json.dumps({
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'service': getattr(record, 'service', None),
+            'event': getattr(record, 'event', None),
+            'actor': getattr(record, 'actor', None),
+            'entity': getattr(record, 'entity', None),
+            'message': record.getMessage()
+        }, default=str)
+
+class ServiceFilter(logging.Filter):
+    """
+    Tags every record with the name of the service that logged it.
+
+    :param service: Service name, e.g. ``bookings_service``.
+    :type service: str
+    """
+
+    def __init__(self, service):
+        super().__init__()
+        self.service = service
+
+    def filter(self, record):
+        record.service = self.service
+        return True
+
+class SegmentedFileHandler(logging.Handler):
+    """
+    Appends records to numbered segment files, rotating by size.
+
+    Segments are named ``<base>.000001``, ``<base>.000002``... and are never
+    renamed, so byte offsets into them stay valid. Every ``index_interval``
+    bytes the handler appends ``<epoch> <offset>`` to the segment's ``.idx``
+    sidecar, a sparse time index that readers use to seek. Several processes
+    can share one base path: writes use ``O_APPEND`` and rotation is
+    serialized with a lock file.
+
+    :param base_path: Path prefix of the segments.
+    :type base_path: str
+    :param max_bytes: Size after which a new segment is started.
+    :type max_bytes: int
+    :param index_interval: Minimum bytes between two index entries.
+    :type index_interval: int
+    """
+
+    def __init__(self, base_path, max_bytes, index_interval):
+        super().__init__()
+        self.base_path = os.path.abspath(base_path)
+        self.max_bytes = max_bytes
+        self.index_interval = index_interval
+        self.segment = None
+        self.fd = None
+        self.index_fd = None
+        self.last_indexed = None
+
+    @contextmanager
+    def _rotation_lock(self):
+        lock_fd = os.open(self.base_path + '.lock', os.O_WRONLY | os.O_CREAT, 0o644)
+        try:
+            if fcntl:
+                fcntl.flock(lock_fd, fcntl.LOCK_EX)
+            yield
+        finally:
+            os.close(lock_fd)
+
+    def _latest_segment(self):
+        directory, prefix = os.path.split(self.base_path)
+        prefix += '.'
+        numbers = [
+            int(name[len(prefix):].split('.')[0]) for name in os.listdir(directory)
+            if name.startswith(prefix) and name[len(prefix):].split('.')[0].isdigit()
+        ]
+        return max(numbers, default=0)
+
+    def _open_segment(self, number):
+        self._close_files()
+        path = f"{self.base_path}.{number:06d}"
+        flags = os.O_WRONLY | os.O_APPEND | os.O_CREAT
+        self.fd = os.open(path, flags, 0o644)
+        self.index_fd = os.open(path + '.idx', flags, 0o644)
+        self.segment = number
+        self.last_indexed = None
+
+    def _ensure_segment(self):
+        if self.fd is not None and os.fstat(self.fd).st_size < self.max_bytes:
+            return
+        with self._rotation_lock():
+            latest = self._latest_segment()
+            # Start a new segment unless another process already did
+            if latest == 0 or (latest == self.segment and os.fstat(self.fd).st_size >= self.max_bytes):
+                latest += 1
+            self._open_segment(latest)
+
+    def emit(self, record):
+        try:
+            line = (self.format(record) + '\n').encode('utf-8')
+            self._ensure_segment()
+            os.write(self.fd, line)
+            start = os.lseek(self.fd, 0, os.SEEK_CUR) - len(line)
+            if self.last_indexed is None or start - self.last_indexed >= self.index_interval:
+                os.write(self.index_fd, f"{record.created:.6f} {start}\n".encode())
+                self.last_indexed = start
+        except Exception:
+            self.handleError(record)
+
+    def _close_files(self):
+        for fd in (self.fd, self.index_fd):
+            if fd is not None:
+                os.close(fd)
+        self.fd = self.index_fd = None
+
+    def close(self):
+        self.acquire()
+        try:
+            self._close_files()
+        finally:
+            self.release()
+        super().close()
+
+class BoundedQueueHandler(QueueHandler):
+    """
+    Hands records to a bounded queue, applying an overflow policy when it is full.
+
+    :param log_queue: Bounded queue drained by the background writer.
+    :type log_queue: queue.Queue
+    :param policy: ``drop``, ``drop_oldest`` or ``block``.
+    :type policy: str
+    :param block_timeout: Seconds to wait for room under the ``block`` policy.
+    :type block_timeout: float
+    """
+
+    def __init__(self, log_queue, policy='drop', block_timeout=1.0):
+        super().__init__(log_queue)
+        self.policy = policy
+        self.block_timeout = block_timeout
+        self.dropped = 0
+
+    def prepare(self, record):
+        # Keep the event fields for the JSON formatter, drop unpicklable args
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        record.exc_text = None
+        return record
+
+    def enqueue(self, record):
+        if self.policy == 'block':
+            try:
+                self.queue.put(record, timeout=self.block_timeout)
+            except queue.Full:
+                self.dropped += 1
+            return
+
+        while True:
+            try:
+                self.queue.put_nowait(record)
+                return
+            except queue.Full:
+                self.dropped += 1
+                if self.policy != 'drop_oldest':
+                    return
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+class AuditQueueListener(QueueListener):
+    """
+    Background writer draining the audit queue into the file and console handlers.
+    """
+
+    def enqueue_sentinel(self):
+        # Wait for room instead of failing when stopping with a full queue
+        self.queue.put(self._sentinel)
+
+_listener = None
+
+
+def _start_listener(log_queue, *handlers):
+    global _listener
+    _listener = AuditQueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+def _stop_listener():
+    if _listener:
+        _listener.stop()
+
+def setup_logger(service):
+    """
+    Configures a logger to write a service's audit events to a file and the console.
+
+    The file receives structured JSON lines in size-rotated segments with a
+    sparse time index (see :class:`SegmentedFileHandler`). Request handlers
+    only put records on a bounded queue. A background listener thread does
+    the file and console I/O. It is restarted in forked worker processes and
+    flushed at interpreter exit.
+
+    The handlers sit on the ``audit_logger`` logger and are set up once per
+    process. Each service logs on its own child of it, which tags the
+    records with the service name.
+
+    :param service: Service name, e.g. ``bookings_service``.
+    :type service: str
+    :return: Configured logger instance.
+    :rtype: logging.Logger
+    """
+    logger= logging.getLogger('audit_logger')
+    logger.setLevel(logging.INFO)
+
+    if not logger.handlers:
+        # segmented JSON lines file handler
+        file_handler = SegmentedFileHandler(AUDIT_LOG_FILE, AUDIT_MAX_BYTES, AUDIT_INDEX_INTERVAL)
+        file_handler.setLevel(logging.INFO)
+        file_handler.setFormatter(JsonLineFormatter())
+
+        # console handler
+        console_handler = logging.StreamHandler()
+        console_handler.setLevel(logging.INFO)
+        console_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+
+        # queue feeding the background writer
+        queue_handler = BoundedQueueHandler(
+            queue.Queue(maxsize=AUDIT_QUEUE_SIZE), AUDIT_OVERFLOW_POLICY, AUDIT_BLOCK_TIMEOUT
+        )
+
+        def restart_in_child():
+            # Threads do not survive fork, so each worker gets its own queue and writer
+            queue_handler.queue = queue.Queue(maxsize=AUDIT_QUEUE_SIZE)
+            _start_listener(queue_handler.queue, file_handler, console_handler)
+
+        _start_listener(queue_handler.queue, file_handler, console_handler)
+        os.register_at_fork(after_in_child=restart_in_child)
+        atexit.register(_stop_listener)
+        logger.addHandler(queue_handler)
+
+    service_logger = logger.getChild(service)
+    if not service_logger.filters:
+        service_logger.addFilter(ServiceFilter(service))
+    return service_logger
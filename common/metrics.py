@@ -0,0 +1,507 @@
+import atexit
+import fcntl
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import Response, current_app, g, has_request_context, request
+from sqlalchemy import event
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Seconds between snapshots of a worker's registry in METRICS_DIR
+METRICS_FLUSH_SECONDS = float(os.environ.get('METRICS_FLUSH_SECONDS', 1))
+
+
+class Histogram:
+    """
+    Cumulative histogram in the Prometheus layout.
+
+    :param buckets: Upper bounds of the buckets, ascending.
+    :type buckets: tuple
+    """
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        """
+        Records one value.
+
+        :param value: The observed value.
+        :type value: float
+        """
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def to_dict(self):
+        return {'counts': self.counts, 'sum': self.sum, 'count': self.count}
+
+    def merge(self, data):
+        """
+        Adds the observations of a histogram saved with :meth:`to_dict`.
+
+        :param data: The saved histogram, with the same buckets.
+        :type data: dict
+        """
+        self.counts = [mine + theirs for mine, theirs in zip(self.counts, data['counts'])]
+        self.sum += data['sum']
+        self.count += data['count']
+
+    def render(self, name, labels):
+        """
+        Renders the ``_bucket``, ``_sum`` and ``_count`` samples.
+
+        :param name: Metric name.
+        :type name: str
+        :param labels: Rendered labels without braces, may be empty.
+        :type labels: str
+        :return: Sample lines.
+        :rtype: list
+        """
+        prefix = f"{labels}," if labels else ''
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{prefix}le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{prefix}le="+Inf"}} {self.count}')
+        suffix = f"{{{labels}}}" if labels else ''
+        lines.append(f"{name}_sum{suffix} {self.sum}")
+        lines.append(f"{name}_count{suffix} {self.count}")
+        return lines
+
+def format_labels(**labels):
+    """
+    Renders Prometheus labels, escaping their values.
+
+    :return: ``key="value"`` pairs joined by commas.
+    :rtype: str
+    """
+    escaped = (
+        (key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in labels.items()
+    )
+    return ','.join(f'{key}="{value}"' for key, value in escaped)
+
+class MetricsRegistry:
+    """
+    Request, database and cache metrics of one service in this process.
+
+    Every worker process keeps its own registry. With ``METRICS_DIR`` set,
+    workers save snapshots there and ``/metrics`` adds them up, see
+    :meth:`SnapshotWriter.collect`.
+
+    :param service: Service name, the ``service`` label of every sample.
+    :type service: str
+    """
+
+    def __init__(self, service):
+        self.service = service
+        self.lock = threading.Lock()
+        self.requests = {}
+        self.latency = {}
+        self.db_queries = {}
+        self.db_seconds = {}
+        self.cache = {}
+
+    def observe_request(self, method, route, status, seconds, queries, query_seconds):
+        """
+        Records one finished request.
+
+        :param method: HTTP method.
+        :type method: str
+        :param route: URL rule that matched, e.g. ``/rooms/<int:room_id>``.
+        :type route: str
+        :param status: Response status code.
+        :type status: int
+        :param seconds: Time spent handling the request.
+        :type seconds: float
+        :param queries: Number of SQL statements executed.
+        :type queries: int
+        :param query_seconds: Time spent executing them.
+        :type query_seconds: float
+        """
+        key = (method, route)
+        with self.lock:
+            self.requests[key + (status,)] = self.requests.get(key + (status,), 0) + 1
+            self.latency.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(seconds)
+            self.db_queries.setdefault(key, Histogram(QUERY_COUNT_BUCKETS)).observe(queries)
+            self.db_seconds.setdefault(key, Histogram(LATENCY_BUCKETS)).observe(query_seconds)
+
+    def observe_cache(self, name, hit):
+        """
+        Records one cache lookup.
+
+        :param name: Name of the cache, e.g. ``rooms``.
+        :type name: str
+        :param hit: Whether the value was found.
+        :type hit: bool
+        """
+        key = (name, 'hit' if hit else 'miss')
+        with self.lock:
+            self.cache[key] = self.cache.get(key, 0) + 1
+
+    def snapshot(self):
+        """
+        Copies the registry into JSON-serializable form.
+
+        :return: The counters and histograms, keyed by their label tuples.
+        :rtype: dict
+        """
+        with self.lock:
+            return {
+                'requests': [[list(key), count] for key, count in self.requests.items()],
+                'latency': [[list(key), histogram.to_dict()] for key, histogram in self.latency.items()],
+                'db_queries': [[list(key), histogram.to_dict()] for key, histogram in self.db_queries.items()],
+                'db_seconds': [[list(key), histogram.to_dict()] for key, histogram in self.db_seconds.items()],
+                'cache': [[list(key), count] for key, count in self.cache.items()],
+            }
+
+    def merge(self, snapshot):
+        """
+        Adds a snapshot taken with :meth:`snapshot` to this registry.
+
+        :param snapshot: The snapshot.
+        :type snapshot: dict
+        """
+        with self.lock:
+            for name in ('requests', 'cache'):
+                counters = getattr(self, name)
+                for key, count in snapshot[name]:
+                    counters[tuple(key)] = counters.get(tuple(key), 0) + count
+            for name, buckets in (('latency', LATENCY_BUCKETS), ('db_queries', QUERY_COUNT_BUCKETS),
+                                  ('db_seconds', LATENCY_BUCKETS)):
+                histograms = getattr(self, name)
+                for key, data in snapshot[name]:
+                    histograms.setdefault(tuple(key), Histogram(buckets)).merge(data)
+
+    def render(self):
+        """
+        Renders every metric in the Prometheus text exposition format.
+
+        :return: The exposition text.
+        :rtype: str
+        """
+        service = {'service': self.service}
+        lines = []
+        with self.lock:
+            lines += ['# HELP http_requests_total Requests handled, by route and status code.',
+                      '# TYPE http_requests_total counter']
+            for (method, route, status), count in sorted(self.requests.items()):
+                lines.append(f"http_requests_total{{{format_labels(**service, method=method, route=route, status=status)}}} {count}")
+            for name, help_text, histograms in (
+                ('http_request_duration_seconds', 'Request latency.', self.latency),
+                ('http_request_db_queries', 'SQL statements executed per request.', self.db_queries),
+                ('http_request_db_duration_seconds', 'Time spent in SQL per request.', self.db_seconds),
+            ):
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+                for (method, route), histogram in sorted(histograms.items()):
+                    lines += histogram.render(name, format_labels(**service, method=method, route=route))
+            lines += ['# HELP cache_requests_total Cache lookups, by result.',
+                      '# TYPE cache_requests_total counter']
+            for (name, result), count in sorted(self.cache.items()):
+                lines.append(f"cache_requests_total{{{format_labels(**service, cache=name, result=result)}}} {count}")
+        return '\n'.join(lines) + '\n'
+
+class SnapshotWriter:
+    """
+    Saves a service's registry to ``METRICS_DIR`` for the other workers.
+
+    Requests only mark the registry as changed. A background thread saves
+    it at most every ``METRICS_FLUSH_SECONDS``, so snapshots trail the live
+    counts by about that much and requests never wait on the disk.
+
+    Each worker writes its own ``<service>-<pid>-<suffix>.json`` file. When
+    it exits, its counts are added to ``<service>.retired.json`` and the file
+    is deleted; files of workers that died without exiting cleanly are
+    folded in the same way by :meth:`collect`. Recycled workers so neither
+    pile up files nor make the counters go down.
+
+    :param registry: The registry to save.
+    :type registry: MetricsRegistry
+    """
+
+    def __init__(self, registry):
+        self.registry = registry
+        self.lock = threading.Lock()
+        self.pid = None
+        self.path = None
+        self.thread_pid = None
+        self.dirty = False
+        self.closed = False
+        atexit.register(self.remove)
+
+    def file_path(self, directory):
+        # Forked workers inherit the writer, so the file is picked per process
+        if self.pid != os.getpid() or os.path.dirname(self.path) != directory:
+            self.pid = os.getpid()
+            self.path = os.path.join(directory, f"{self.registry.service}-{self.pid}-{uuid.uuid4().hex[:8]}.json")
+        return self.path
+
+    def mark_changed(self):
+        """Schedules a save, starting the saving thread of this process if needed."""
+        if not os.environ.get('METRICS_DIR'):
+            return
+        self.dirty = True
+        if self.thread_pid != os.getpid():
+            with self.lock:
+                # Threads do not survive a fork, each worker starts its own
+                if self.thread_pid != os.getpid():
+                    self.thread_pid = os.getpid()
+                    threading.Thread(target=self.run, name='metrics-snapshots', daemon=True).start()
+
+    def run(self):
+        while True:
+            time.sleep(METRICS_FLUSH_SECONDS)
+            if self.dirty:
+                self.write()
+
+    def write(self):
+        """Saves the registry now, if ``METRICS_DIR`` is set."""
+        directory = os.environ.get('METRICS_DIR')
+        if not directory:
+            return
+        with self.lock:
+            if self.closed:
+                return
+            self.dirty = False
+            path = self.file_path(directory)
+            try:
+                with open(f"{path}.tmp", 'w') as file:
+                    json.dump(self.registry.snapshot(), file)
+                os.replace(f"{path}.tmp", path)
+            except OSError:
+                pass
+
+    def remove(self):
+        """Moves this worker's counts to the retired ones when it exits, and stops saving."""
+        directory = os.environ.get('METRICS_DIR')
+        with self.lock:
+            if self.closed:
+                return
+            self.closed = True
+            if not directory:
+                return
+            own_path = self.path if self.pid == os.getpid() else None
+            try:
+                with retired_counts(directory, self.registry.service) as retired:
+                    retired.merge(self.registry.snapshot())
+                    if own_path:
+                        os.remove(own_path)
+            except OSError:
+                pass
+
+    def collect(self):
+        """
+        Returns the registry to expose on ``/metrics``.
+
+        Without ``METRICS_DIR`` this is the process registry. Otherwise it is
+        the sum of every live worker's latest snapshot, with this worker's
+        own counts taken live. Any worker can then answer a scrape and the
+        totals do not jump between workers.
+
+        :rtype: MetricsRegistry
+        """
+        directory = os.environ.get('METRICS_DIR')
+        if not directory:
+            return self.registry
+        self.write()
+        service = self.registry.service
+        total = MetricsRegistry(service)
+        try:
+            with retired_counts(directory, service) as retired:
+                for path in glob.glob(os.path.join(directory, f"{service}-*.json")):
+                    if path == self.path:
+                        continue
+                    alive = worker_alive(path)
+                    try:
+                        with open(path) as file:
+                            (total if alive else retired).merge(json.load(file))
+                    except (OSError, ValueError):
+                        pass
+                    if not alive:
+                        os.remove(path)
+                total.merge(retired.snapshot())
+        except OSError:
+            pass
+        total.merge(self.registry.snapshot())
+        return total
+
+@contextmanager
+def retired_counts(directory, service):
+    """
+    Opens the counts of a service's exited workers for update.
+
+    The service's lock file is held until the block ends, so a worker
+    exiting and a scrape pruning its snapshot cannot both add it. The
+    registry is saved back when the block ends.
+
+    :param directory: The ``METRICS_DIR``.
+    :type directory: str
+    :param service: Service name, e.g. ``rooms_service``.
+    :type service: str
+    :rtype: MetricsRegistry
+    """
+    path = os.path.join(directory, f"{service}.retired.json")
+    with open(os.path.join(directory, f"{service}.lock"), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        retired = MetricsRegistry(service)
+        try:
+            with open(path) as file:
+                retired.merge(json.load(file))
+        except (OSError, ValueError):
+            pass
+        saved = retired.snapshot()
+        yield retired
+        if retired.snapshot() != saved:
+            with open(f"{path}.tmp", 'w') as file:
+                json.dump(retired.snapshot(), file)
+            os.replace(f"{path}.tmp", path)
+
+def worker_alive(path):
+    """
+    Tells whether the worker that wrote a snapshot is still running.
+
+    :param path: Snapshot path, ``<service>-<pid>-<suffix>.json``.
+    :type path: str
+    :rtype: bool
+    """
+    try:
+        pid = int(os.path.basename(path).rsplit('-', 2)[1])
+        os.kill(pid, 0)
+    except (IndexError, ValueError, ProcessLookupError):
+        return False
+    except PermissionError:
+        pass
+    return True
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+def service_metrics(service):
+    """
+    Returns the snapshot writer, and through it the registry, of a service in this process.
+
+    The benchmarks and the test suite load several services into one
+    process, so each service keeps its own.
+
+    :param service: Service name, e.g. ``rooms_service``.
+    :type service: str
+    :rtype: SnapshotWriter
+    """
+    with _writers_lock:
+        if service not in _writers:
+            _writers[service] = SnapshotWriter(MetricsRegistry(service))
+        return _writers[service]
+
+def prepare_metrics_dir(service):
+    """
+    Gives the workers of a multi-process server a fresh ``METRICS_DIR``.
+
+    Called by the server master before it forks. A temporary directory is
+    created when ``METRICS_DIR`` is not set, and the snapshots and retired
+    counts of the service left by a previous run are removed.
+
+    :param service: Service name, e.g. ``rooms_service``.
+    :type service: str
+    """
+    directory = os.environ.setdefault('METRICS_DIR', tempfile.mkdtemp(prefix=f"{service}-metrics-"))
+    os.makedirs(directory, exist_ok=True)
+    for path in glob.glob(os.path.join(directory, f"{service}-*.json")) + glob.glob(
+            os.path.join(directory, f"{service}.retired.json")):
+        os.remove(path)
+
+def record_cache(name, hit):
+    """
+    Records a cache hit or miss in the registry of the current app.
+
+    :param name: Name of the cache.
+    :type name: str
+    :param hit: Whether the value was found.
+    :type hit: bool
+    """
+    current_app.extensions['metrics'].registry.observe_cache(name, hit)
+
+def _count_request_query(statement, elapsed):
+    if has_request_context() and 'db_queries' in g:
+        g.db_queries += 1
+        g.db_seconds += elapsed
+
+# Called with each statement and its duration in seconds, after it ran on a timed engine.
+# Keyed by name, so registering an observer again replaces it.
+query_observers = {'request_counts': _count_request_query}
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_start'].pop()
+    for observer in query_observers.values():
+        observer(statement, elapsed)
+
+def time_queries(engine):
+    """
+    Times every statement run on an engine, once however many callers ask.
+
+    :param engine: SQLAlchemy engine.
+    """
+    if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+def init_metrics(app, db, service):
+    """
+    Instruments an app and registers ``GET /metrics``.
+
+    Each request is timed and counted under its URL rule (not the raw path,
+    to keep the label set bounded), with the SQL statements it ran on the
+    app's engine.
+
+    :param app: The Flask application.
+    :type app: flask.Flask
+    :param db: The Flask-SQLAlchemy extension, already initialized on ``app``.
+    :type db: flask_sqlalchemy.SQLAlchemy
+    :param service: Service name, e.g. ``rooms_service``.
+    :type service: str
+    """
+    metrics = app.extensions['metrics'] = service_metrics(service)
+    with app.app_context():
+        time_queries(db.engine)
+
+    @app.before_request
+    def start_request_timer():
+        g.request_start = time.perf_counter()
+        g.db_queries = 0
+        g.db_seconds = 0.0
+
+    @app.after_request
+    def record_request(response):
+        if 'request_start' in g:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            metrics.registry.observe_request(
+                request.method, route, response.status_code,
+                time.perf_counter() - g.request_start, g.db_queries, g.db_seconds
+            )
+            metrics.mark_changed()
+        return response
+
+    @app.route('/metrics', methods=['GET'])
+    def get_metrics():
+        """Returns the metrics of every worker process in Prometheus text format.
+
+        :return: Prometheus exposition text.
+        :rtype: flask.Response
+        """
+        return Response(metrics.collect().render(), mimetype=None, content_type=CONTENT_TYPE)
@@ -0,0 +1,128 @@
+import hashlib
+import logging
+import os
+import re
+from collections import Counter
+
+from flask import g, has_request_context, request
+
+from common.db_pool import env_flag
+from common.metrics import query_observers, time_queries
+
+QUERY_COUNT_THRESHOLD = int(os.environ.get('QUERY_COUNT_THRESHOLD', 20))
+SLOW_REQUEST_DB_MS = float(os.environ.get('SLOW_REQUEST_DB_MS', 200))
+# The same statement run this many times in one request looks like an N+1 loop
+REPEATED_QUERY_THRESHOLD = int(os.environ.get('REPEATED_QUERY_THRESHOLD', 5))
+MAX_REPORTED_FINGERPRINTS = 5
+
+query_logger = logging.getLogger('query_tracker')
+
+_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|%\(\w+\)s|%s|:\w+|\?")
+_VALUE_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_statement(statement):
+    """
+    Reduces a SQL statement to its shape.
+
+    Literals and bind parameters become ``?`` and value lists such as
+    ``IN (?, ?, ?)`` collapse to ``(?)``, so the same query with other values
+    normalizes to the same text.
+
+    :param statement: The SQL statement.
+    :type statement: str
+    :return: The normalized statement.
+    :rtype: str
+    """
+    statement = _LITERALS.sub('?', statement)
+    statement = _VALUE_LISTS.sub('(?)', statement)
+    return _WHITESPACE.sub(' ', statement).strip()
+
+def fingerprint(statement):
+    """
+    Returns a short stable identifier of a statement's shape.
+
+    :param statement: The SQL statement.
+    :type statement: str
+    :return: 12 hex digits.
+    :rtype: str
+    """
+    return hashlib.sha1(normalize_statement(statement).encode()).hexdigest()[:12]
+
+def _track_query(statement, elapsed):
+    if has_request_context() and 'tracked_queries' in g:
+        g.tracked_queries.append((statement, elapsed))
+
+def summarize(queries):
+    """
+    Groups the queries of a request by fingerprint.
+
+    :param queries: ``(statement, seconds)`` pairs in execution order.
+    :type queries: list
+    :return: ``(fingerprint, count, total_ms, normalized_statement)`` tuples, most frequent first.
+    :rtype: list
+    """
+    counts, times, examples = Counter(), Counter(), {}
+    for statement, elapsed in queries:
+        key = fingerprint(statement)
+        counts[key] += 1
+        times[key] += elapsed * 1000
+        examples.setdefault(key, statement)
+    return [
+        (key, count, round(times[key], 3), normalize_statement(examples[key]))
+        for key, count in counts.most_common()
+    ]
+
+def init_query_tracker(app, db):
+    """
+    Counts the SQL statements and database time of every request, when enabled.
+
+    Opt-in through ``app.config['QUERY_TRACKING']`` (``QUERY_TRACKING`` in the
+    environment), and always on in debug mode. A warning is logged on the
+    ``query_tracker`` logger, with the statement fingerprints, when a request
+    runs more than ``QUERY_COUNT_THRESHOLD`` statements, spends more than
+    ``SLOW_REQUEST_DB_MS`` in the database, or repeats one statement
+    ``REPEATED_QUERY_THRESHOLD`` times (an N+1 pattern). In debug mode, or
+    with ``QUERY_TRACKING_HEADERS``, responses carry ``X-DB-Queries`` and
+    ``X-DB-Time`` (milliseconds).
+
+    :param app: The Flask application.
+    :type app: flask.Flask
+    :param db: The Flask-SQLAlchemy extension, already initialized on ``app``.
+    :type db: flask_sqlalchemy.SQLAlchemy
+    """
+    app.config.setdefault('QUERY_TRACKING', env_flag('QUERY_TRACKING', False))
+    app.config.setdefault('QUERY_TRACKING_HEADERS', env_flag('QUERY_TRACKING_HEADERS', False))
+    # Shares the statement timer of the metrics module instead of timing each statement twice
+    query_observers['query_tracker'] = _track_query
+    with app.app_context():
+        time_queries(db.engine)
+
+    @app.before_request
+    def start_query_tracking():
+        if app.config['QUERY_TRACKING'] or app.debug:
+            g.tracked_queries = []
+
+    @app.after_request
+    def report_queries(response):
+        queries = g.pop('tracked_queries', None)
+        if queries is None:
+            return response
+        total_ms = sum(elapsed for _, elapsed in queries) * 1000
+        if app.config['QUERY_TRACKING_HEADERS'] or app.debug:
+            response.headers['X-DB-Queries'] = str(len(queries))
+            response.headers['X-DB-Time'] = f"{total_ms:.3f}"
+
+        groups = summarize(queries)
+        repeated = [group for group in groups if group[1] >= REPEATED_QUERY_THRESHOLD]
+        if len(queries) > QUERY_COUNT_THRESHOLD or total_ms > SLOW_REQUEST_DB_MS or repeated:
+            details = '; '.join(
+                f"{key} x{count} {elapsed}ms: {statement}"
+                for key, count, elapsed, statement in groups[:MAX_REPORTED_FINGERPRINTS]
+            )
+            query_logger.warning(
+                f"{request.method} {request.path}: {len(queries)} queries, {total_ms:.1f}ms in the database"
+                f"{' (possible N+1)' if repeated else ''}. {details}"
+            )
+        return response
@@ -0,0 +1,109 @@
+import importlib
+import multiprocessing
+import os
+
+from gunicorn.app.base import BaseApplication
+
+from common.db_pool import env_flag
+from common.metrics import prepare_metrics_dir
+
+
+def server_options(port):
+    """
+    Builds the gunicorn settings from the environment.
+
+    - WEB_WORKERS: worker processes, ``2 * CPUs + 1`` by default.
+    - WEB_THREADS: threads per worker. Above 1 the ``gthread`` worker is used.
+    - WEB_PRELOAD: import the app in the master before forking (default on),
+      so workers share its memory and start faster.
+    - WEB_KEEPALIVE: seconds an idle keep-alive connection is held open.
+    - WEB_TIMEOUT / WEB_GRACEFUL_TIMEOUT: hard and graceful worker timeouts.
+    - WEB_MAX_REQUESTS: recycle a worker after this many requests (0 = never).
+    - WEB_BIND: listen address, ``0.0.0.0:<port>`` by default.
+
+    :param port: The service's port.
+    :type port: int
+    :return: gunicorn settings.
+    :rtype: dict
+    """
+    return {
+        'bind': os.environ.get('WEB_BIND', f"0.0.0.0:{port}"),
+        'workers': int(os.environ.get('WEB_WORKERS', multiprocessing.cpu_count() * 2 + 1)),
+        'threads': int(os.environ.get('WEB_THREADS', 1)),
+        'preload_app': env_flag('WEB_PRELOAD', True),
+        'keepalive': int(os.environ.get('WEB_KEEPALIVE', 5)),
+        'timeout': int(os.environ.get('WEB_TIMEOUT', 30)),
+        'graceful_timeout': int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 30)),
+        'max_requests': int(os.environ.get('WEB_MAX_REQUESTS', 0)),
+        'max_requests_jitter': int(os.environ.get('WEB_MAX_REQUESTS_JITTER', 0)),
+        'accesslog': os.environ.get('WEB_ACCESS_LOG'),
+    }
+
+def load_app(app_module):
+    """
+    Imports a service's Flask application.
+
+    :param app_module: Module defining ``app`` and ``db``, e.g. ``rooms_service.app``.
+    :type app_module: str
+    :return: The WSGI application and its database.
+    :rtype: tuple
+    """
+    module = importlib.import_module(app_module)
+    return module.app, module.db
+
+class ServiceApplication(BaseApplication):
+    """
+    Runs a service under gunicorn's pre-fork server.
+
+    Send ``SIGHUP`` to the master for a graceful reload: new workers are
+    started and old ones finish their in-flight requests first. With preload
+    on, the code is not re-imported on ``SIGHUP``; deploy new code with
+    ``SIGUSR2`` (new master) followed by ``SIGTERM`` to the old master.
+
+    :param app_module: Module defining ``app`` and ``db``, e.g. ``rooms_service.app``.
+    :type app_module: str
+    :param options: gunicorn settings.
+    :type options: dict
+    """
+
+    def __init__(self, app_module, options):
+        self.app_module = app_module
+        self.options = dict(options, post_fork=self.post_fork)
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            if key in self.cfg.settings and value is not None:
+                self.cfg.set(key, value)
+
+    def load(self):
+        return load_app(self.app_module)[0]
+
+    def post_fork(self, server, worker):
+        """
+        Drops database connections inherited from the master after a fork.
+
+        Importing the app no longer connects, but with preload any connection
+        the master did open would be shared between workers, and sharing a
+        socket corrupts the protocol stream.
+
+        :param server: The gunicorn arbiter.
+        :param worker: The new worker.
+        """
+        if server.cfg.preload_app:
+            app, db = load_app(self.app_module)
+            with app.app_context():
+                db.engine.dispose(close=False)
+
+def serve(app_module, port):
+    """
+    Serves a service with gunicorn until the master is stopped.
+
+    :param app_module: Module defining ``app`` and ``db``, e.g. ``rooms_service.app``.
+    :type app_module: str
+    :param port: Port to listen on unless ``WEB_BIND`` is set.
+    :type port: int
+    """
+    # Before the app is imported, so every worker sums its metrics with the others
+    prepare_metrics_dir(app_module.partition('.')[0])
+    ServiceApplication(app_module, server_options(port)).run()
@@ -0,0 +1,64 @@
+import gzip
+import os
+import shutil
+
+try:
+    from reviews_service.log_reader import list_segments, segment_path, ARCHIVE_SUFFIX, READ_BLOCK_SIZE
+except ImportError:
+    from log_reader import list_segments, segment_path, ARCHIVE_SUFFIX, READ_BLOCK_SIZE
+
+AUDIT_ARCHIVE_LEVEL = int(os.environ.get('AUDIT_ARCHIVE_LEVEL', 6))
+
+
+def archive_segment(number, base_path=None, compresslevel=AUDIT_ARCHIVE_LEVEL):
+    """
+    Compresses one closed segment to ``<segment>.gz`` and removes the original.
+
+    The archive is written to a temporary file and renamed into place, so
+    readers always see either the live segment or a complete archive. The
+    ``.idx`` sidecar is kept: its offsets refer to the uncompressed content.
+
+    :param number: Segment number.
+    :type number: int
+    :param base_path: Base path of the audit log.
+    :type base_path: str
+    :param compresslevel: gzip compression level, 1 (fast) to 9 (small).
+    :type compresslevel: int
+    :return: True if the segment was archived, False if it already was.
+    :rtype: bool
+    """
+    path = segment_path(number, base_path)
+    temporary_path = f"{path}{ARCHIVE_SUFFIX}.tmp.{os.getpid()}"
+    try:
+        with open(path, 'rb') as source, gzip.open(temporary_path, 'wb', compresslevel) as target:
+            shutil.copyfileobj(source, target, READ_BLOCK_SIZE)
+    except FileNotFoundError:
+        return False
+    os.replace(temporary_path, path + ARCHIVE_SUFFIX)
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        # Another archiver got there first
+        return False
+    return True
+
+def archive_segments(base_path=None, compresslevel=AUDIT_ARCHIVE_LEVEL):
+    """
+    Compresses every closed audit log segment.
+
+    The newest segment is still being written and is left alone, as is the
+    legacy unsegmented ``audit.log``.
+
+    :param base_path: Base path of the audit log.
+    :type base_path: str
+    :param compresslevel: gzip compression level.
+    :type compresslevel: int
+    :return: Numbers of the segments archived by this call.
+    :rtype: list
+    """
+    segments = [number for number in list_segments(base_path) if number]
+    return [
+        number for number in segments[:-1]
+        if os.path.exists(segment_path(number, base_path))
+        and archive_segment(number, base_path, compresslevel)
+    ]
@@ -0,0 +1,377 @@
+import gzip
+import json
+import os
+from collections import deque
+from datetime import datetime, timezone
+
+AUDIT_LOG_PATH = os.environ.get('AUDIT_LOG_FILE', 'audit.log')
+READ_BLOCK_SIZE = 64 * 1024
+ARCHIVE_SUFFIX = '.gz'
+# Writers in different processes append slightly out of time order, so index
+# lookups start this many seconds early to avoid skipping matching lines.
+INDEX_SKEW_SECONDS = 5
+
+
+def segment_path(number, base_path=None):
+    """
+    Returns the path of an audit log segment.
+
+    Segment 0 is the legacy unsegmented, plain-text ``audit.log``.
+
+    :param number: Segment number.
+    :type number: int
+    :param base_path: Base path of the audit log, ``AUDIT_LOG_PATH`` by default.
+    :type base_path: str
+    :return: Path of the segment file.
+    :rtype: str
+    """
+    base_path = base_path or AUDIT_LOG_PATH
+    return base_path if number == 0 else f"{base_path}.{number:06d}"
+
+def list_segments(base_path=None):
+    """
+    Lists the existing audit log segments, oldest first.
+
+    Archived segments (``<base>.000001.gz``) are listed like live ones.
+
+    :param base_path: Base path of the audit log, ``AUDIT_LOG_PATH`` by default.
+    :type base_path: str
+    :return: Segment numbers.
+    :rtype: list
+    """
+    base_path = os.path.abspath(base_path or AUDIT_LOG_PATH)
+    directory, prefix = os.path.split(base_path)
+    prefix += '.'
+    numbers = set()
+    if os.path.exists(base_path):
+        numbers.add(0)
+    for name in os.listdir(directory):
+        suffix = name[len(prefix):]
+        if suffix.endswith(ARCHIVE_SUFFIX):
+            suffix = suffix[:-len(ARCHIVE_SUFFIX)]
+        if name.startswith(prefix) and suffix.isdigit():
+            numbers.add(int(suffix))
+    return sorted(numbers)
+
+def open_segment(number, base_path=None):
+    """
+    Opens a segment for binary reading, live or archived.
+
+    Archived segments are decompressed on the fly as they are read, and byte
+    offsets refer to the uncompressed content in both cases.
+
+    :param number: Segment number.
+    :type number: int
+    :param base_path: Base path of the audit log.
+    :type base_path: str
+    :return: The open file.
+    :raises FileNotFoundError: If the segment does not exist.
+    """
+    path = segment_path(number, base_path)
+    try:
+        return open(path, 'rb')
+    except FileNotFoundError:
+        # Archived since it was listed, or already before
+        return gzip.open(path + ARCHIVE_SUFFIX, 'rb')
+
+def segment_start(number, base_path=None):
+    """
+    Returns the time of the first indexed line of a segment.
+
+    :param number: Segment number.
+    :type number: int
+    :param base_path: Base path of the audit log.
+    :type base_path: str
+    :return: Epoch seconds, or None if the segment has no index.
+    :rtype: float
+    """
+    index = read_index(number, base_path)
+    return index[0][0] if index else None
+
+def read_index(number, base_path=None):
+    """
+    Loads the sparse ``epoch offset`` index of a segment, ordered by offset.
+
+    :param number: Segment number.
+    :type number: int
+    :param base_path: Base path of the audit log.
+    :type base_path: str
+    :return: List of ``(epoch, offset)`` pairs, empty if there is no index.
+    :rtype: list
+    """
+    try:
+        with open(segment_path(number, base_path) + '.idx') as index_file:
+            entries = [line.split() for line in index_file]
+    except FileNotFoundError:
+        return []
+    return sorted(((float(epoch), int(offset)) for epoch, offset in entries if epoch), key=lambda e: e[1])
+
+def seek_offset(index, since):
+    """
+    Finds where to start reading a segment for entries at or after ``since``.
+
+    :param index: Index entries from :func:`read_index`.
+    :type index: list
+    :param since: Start of the time range.
+    :type since: datetime
+    :return: Byte offset of an indexed line written before ``since``, or 0.
+    :rtype: int
+    """
+    threshold = since.timestamp() - INDEX_SKEW_SECONDS
+    offset = 0
+    for epoch, entry_offset in index:
+        if epoch > threshold:
+            break
+        offset = entry_offset
+    return offset
+
+def as_utc(value):
+    """
+    Makes a datetime timezone-aware, reading naive values as UTC.
+
+    :param value: The datetime.
+    :type value: datetime
+    :return: An aware datetime.
+    :rtype: datetime
+    """
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+def parse_line(line):
+    """
+    Parses one audit log line.
+
+    JSON lines are returned as their object with ``ts`` parsed. Legacy
+    ``asctime - LEVEL - message`` lines become an object with the same keys.
+    Anything else only has a ``message``.
+
+    :param line: One decoded log line.
+    :type line: str
+    :return: The entry, with ``ts`` a UTC datetime or None.
+    :rtype: dict
+    """
+    line = line.rstrip('\n')
+    if line.startswith('{'):
+        try:
+            entry = json.loads(line)
+            entry['ts'] = as_utc(datetime.fromisoformat(entry['ts']))
+            return entry
+        except (ValueError, KeyError, TypeError):
+            pass
+    parts = line.split(' - ', 2)
+    if len(parts) == 3:
+        try:
+            timestamp = datetime.strptime(parts[0], '%Y-%m-%d %H:%M:%S,%f')
+            return {'ts': as_utc(timestamp), 'level': parts[1].strip(), 'message': parts[2]}
+        except ValueError:
+            pass
+    return {'ts': None, 'message': line}
+
+def find_tail_offset(log_file, lines):
+    """
+    Finds the byte offset where the last ``lines`` lines of a file start.
+
+    Reads backwards from the end in fixed-size blocks, so the cost depends on
+    the size of the tail, not of the file. A trailing partial line is not
+    counted.
+
+    Archived segments cannot seek from the end, so they are scanned forwards
+    keeping only the last line offsets.
+
+    :param log_file: File opened in binary mode.
+    :param lines: Number of trailing lines wanted.
+    :type lines: int
+    :return: Byte offset of the first wanted line, and how many complete
+        lines start there (fewer than ``lines`` if the file is shorter).
+    :rtype: tuple
+    """
+    if isinstance(log_file, gzip.GzipFile):
+        ends = deque([0], maxlen=max(lines, 0) + 1)
+        for line in log_file:
+            if line.endswith(b'\n'):
+                ends.append(ends[-1] + len(line))
+        return ends[0], len(ends) - 1
+
+    log_file.seek(0, os.SEEK_END)
+    position = log_file.tell()
+    if position == 0:
+        return 0, 0
+
+    # The newline ending the last complete line does not start a new one. A
+    # partial line after it is still being written and is not counted.
+    wanted = max(lines, 0) + 1
+    found = 0
+    while position > 0:
+        size = min(READ_BLOCK_SIZE, position)
+        position -= size
+        log_file.seek(position)
+        block = log_file.read(size)
+        index = len(block)
+        while True:
+            index = block.rfind(b'\n', 0, index)
+            if index < 0:
+                break
+            found += 1
+            if found == wanted:
+                return position + index + 1, lines
+    return 0, found
+
+class AuditLogReader:
+    """
+    Reads matching audit entries across segments, starting at a cursor.
+
+    ``segment`` and ``offset`` always point just after the last complete line
+    consumed, so they can be handed back to clients as the next cursor.
+
+    :param segment: Segment number to start from.
+    :type segment: int
+    :param offset: Byte offset in that segment.
+    :type offset: int
+    :param base_path: Base path of the audit log, ``AUDIT_LOG_PATH`` by default.
+    :type base_path: str
+    """
+
+    def __init__(self, segment=0, offset=0, base_path=None):
+        self.segment = segment
+        self.offset = offset
+        self.base_path = base_path
+
+    @property
+    def cursor(self):
+        """
+        The cursor of the next read, ``<segment>:<offset>``.
+
+        :rtype: str
+        """
+        return f"{self.segment}:{self.offset}"
+
+    @classmethod
+    def from_cursor(cls, cursor, base_path=None):
+        """
+        Builds a reader from a cursor returned by a previous read.
+
+        :param cursor: The ``<segment>:<offset>`` cursor.
+        :type cursor: str
+        :param base_path: Base path of the audit log.
+        :type base_path: str
+        :return: The reader.
+        :rtype: AuditLogReader
+        :raises ValueError: If the cursor is malformed.
+        """
+        segment, offset = cursor.split(':')
+        return cls(int(segment), max(0, int(offset)), base_path)
+
+    @classmethod
+    def from_tail(cls, lines, base_path=None):
+        """
+        Builds a reader positioned on the last ``lines`` lines of the log.
+
+        :param lines: Number of trailing lines wanted.
+        :type lines: int
+        :param base_path: Base path of the audit log.
+        :type base_path: str
+        :return: The reader.
+        :rtype: AuditLogReader
+        """
+        segments = list_segments(base_path)
+        reader = cls(segments[-1] if segments else 0, 0, base_path)
+        for number in reversed(segments):
+            with open_segment(number, base_path) as log_file:
+                offset, found = find_tail_offset(log_file, lines)
+            reader.segment, reader.offset = number, offset
+            lines -= found
+            if lines <= 0:
+                break
+        return reader
+
+    @classmethod
+    def from_time(cls, since, base_path=None):
+        """
+        Builds a reader positioned shortly before ``since`` using the segment indexes.
+
+        Segments that start after ``since`` are not opened.
+
+        :param since: Start of the time range.
+        :type since: datetime
+        :param base_path: Base path of the audit log.
+        :type base_path: str
+        :return: The reader.
+        :rtype: AuditLogReader
+        """
+        since = as_utc(since)
+        threshold = since.timestamp() - INDEX_SKEW_SECONDS
+        start = cls(0, 0, base_path)
+        for number in list_segments(base_path):
+            index = read_index(number, base_path)
+            if number and index and index[0][0] > threshold:
+                break
+            start = cls(number, seek_offset(index, since) if index else 0, base_path)
+        return start
+
+    def entries(self, limit, since=None, until=None, levels=None, event=None, actor=None):
+        """
+        Yields up to ``limit`` matching entries, moving on to newer segments as needed.
+
+        A trailing line still being written (no newline yet) is left for the
+        next read. Time filters drop lines without a timestamp. Segments that
+        end before ``since`` are skipped without being opened, and reading
+        stops once lines or segments are well past ``until``.
+
+        :param limit: Maximum number of entries to yield.
+        :type limit: int
+        :param since: Only entries logged at or after this time.
+        :type since: datetime
+        :param until: Only entries logged before this time.
+        :type until: datetime
+        :param levels: Only entries with one of these levels, e.g. ``{'WARNING'}``.
+        :type levels: set
+        :param event: Only entries of this event type, e.g. ``booking.created``.
+        :type event: str
+        :param actor: Only entries of this actor.
+        :type actor: str
+        :return: Generator of entry dictionaries.
+        :rtype: generator
+        """
+        since = as_utc(since) if since else None
+        until = as_utc(until) if until else None
+        stop_after = until.timestamp() + INDEX_SKEW_SECONDS if until else None
+        skip_before = since.timestamp() - INDEX_SKEW_SECONDS if since else None
+        emitted = 0
+        segments = [number for number in list_segments(self.base_path) if number >= self.segment]
+        for position, number in enumerate(segments):
+            if number > self.segment:
+                self.segment, self.offset = number, 0
+            start = segment_start(number, self.base_path) if number else None
+            if stop_after and start and start > stop_after:
+                return
+            # A segment ends where the next one starts
+            if skip_before and position + 1 < len(segments):
+                end = segment_start(segments[position + 1], self.base_path)
+                if end and end < skip_before:
+                    continue
+            with open_segment(number, self.base_path) as log_file:
+                log_file.seek(self.offset)
+                while emitted < limit:
+                    raw = log_file.readline()
+                    if not raw.endswith(b'\n'):
+                        break
+                    entry = parse_line(raw.decode('utf-8', errors='replace'))
+                    timestamp = entry.get('ts')
+                    if stop_after and timestamp and timestamp.timestamp() > stop_after:
+                        return
+                    self.offset += len(raw)
+                    if (since or until) and timestamp is None:
+                        continue
+                    if since and timestamp < since:
+                        continue
+                    if until and timestamp >= until:
+                        continue
+                    if levels and entry.get('level') not in levels:
+                        continue
+                    if event and entry.get('event') != event:
+                        continue
+                    if actor and str(entry.get('actor')) != actor:
+                        continue
+                    emitted += 1
+                    yield entry
+            if emitted >= limit:
+                return
@@ -1,5 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from sqlalchemy.dialects.postgresql import TSVECTOR
 
 db = SQLAlchemy()
 
@@ -21,6 +22,8 @@ class Review(db.Model):
     :type timestamp: datetime
     :param is_flagged: Moderation status.
     :type is_flagged: bool   
+    :param search_vector: ``tsvector`` of the comment used by full-text search (Postgres only).
+    :type search_vector: str
     """
     __tablename__ = 'reviews'
 
@@ -34,6 +37,20 @@ class Review(db.Model):
 
     is_flagged = db.Column(db.Boolean, default=False)
 
+    # Full-text search document of the comment, only populated on Postgres
+    search_vector = db.Column(db.Text().with_variant(TSVECTOR(), 'postgresql'), nullable=True)
+
+    __table_args__ = (
+        # Serves newest-first listings of a room's visible reviews
+        db.Index(
+            'ix_reviews_room_visible_timestamp',
+            room_id, timestamp.desc(), id.desc(),
+            postgresql_where=(is_flagged == db.false()),
+            sqlite_where=(is_flagged == db.false())
+        ),
+        db.Index('ix_reviews_search_vector', search_vector, postgresql_using='gin').ddl_if(dialect='postgresql'),
+    )
+
     def to_dict(self):
         """
         Converts the Review object to a dictionary.
@@ -49,4 +66,108 @@ class Review(db.Model):
             'comment': self.comment,
             'timestamp': self.timestamp.isoformat(),
             'is_flagged': self.is_flagged
-        }
\ No newline at end of file
+        }
+
+    @classmethod
+    def columns(cls):
+        """
+        Columns returned by :meth:`to_dict`, for listings that select column tuples.
+
+        :return: The mapped columns, in ``to_dict()`` order.
+        :rtype: tuple
+        """
+        return (cls.id, cls.user_id, cls.room_id, cls.rating, cls.comment, cls.timestamp, cls.is_flagged)
+
+class RatingTotals:
+    """
+    Running totals of unflagged review ratings, shared by the analytics tables.
+
+    :param review_count: Number of unflagged reviews.
+    :type review_count: int
+    :param rating_sum: Sum of the ratings of unflagged reviews.
+    :type rating_sum: int
+    :param average_rating: ``rating_sum / review_count``, or None without reviews.
+    :type average_rating: float
+    :param rating_1: Number of unflagged 1-star reviews (same for ``rating_2`` to ``rating_5``).
+    :type rating_1: int
+    """
+    review_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_sum = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    average_rating = db.Column(db.Float, nullable=True)
+    rating_1 = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_2 = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_3 = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_4 = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_5 = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    @classmethod
+    def empty(cls, **key):
+        """
+        Builds unsaved zero totals, for a room or scope without any review yet.
+
+        Column defaults only apply on insert, so they are set explicitly.
+
+        :param key: Primary key of the row, e.g. ``room_id=3``.
+        :return: Totals with a zero count, sum and histogram.
+        """
+        return cls(review_count=0, rating_sum=0, average_rating=None,
+                   **{f'rating_{rating}': 0 for rating in range(1, 6)}, **key)
+
+    def totals_dict(self):
+        """
+        Converts the running totals to a dictionary.
+
+        :return: Count, sum, average and a ``"1"``-``"5"`` histogram.
+        :rtype: dict
+        """
+        return {
+            'review_count': self.review_count,
+            'rating_sum': self.rating_sum,
+            'average_rating': round(self.average_rating, 2) if self.average_rating is not None else None,
+            'histogram': {str(rating): getattr(self, f'rating_{rating}') for rating in range(1, 6)}
+        }
+
+class RoomRatingSummary(RatingTotals, db.Model):
+    """
+    Running rating totals of a room, counting only unflagged reviews.
+
+    Maintained by the reviews service on every review write so the rooms
+    service can sort and filter by rating without aggregating reviews.
+
+    :param room_id: ID of the rated room.
+    :type room_id: int
+    """
+    __tablename__ = 'room_rating_summaries'
+
+    room_id = db.Column(db.Integer, primary_key=True)
+    average_rating = db.Column(db.Float, nullable=True, index=True)
+
+    def to_dict(self):
+        """
+        Converts the RoomRatingSummary object to a dictionary.
+
+        :return: Dictionary representation of the RoomRatingSummary object.
+        :rtype: dict
+        """
+        return {'room_id': self.room_id, **self.totals_dict()}
+
+class ReviewAnalytics(RatingTotals, db.Model):
+    """
+    Global rating totals over all rooms, stored as a single row.
+
+    :param id: Always ``GLOBAL_ID``.
+    :type id: int
+    """
+    __tablename__ = 'review_analytics'
+    GLOBAL_ID = 1
+
+    id = db.Column(db.Integer, primary_key=True)
+
+    def to_dict(self):
+        """
+        Converts the ReviewAnalytics object to a dictionary.
+
+        :return: Dictionary representation of the ReviewAnalytics object.
+        :rtype: dict
+        """
+        return self.totals_dict()
@@ -0,0 +1,142 @@
+from collections import Counter
+from sqlalchemy import func, case, cast, text, Float
+from sqlalchemy.exc import IntegrityError
+
+try:
+    from reviews_service.models import db, Review, RoomRatingSummary, ReviewAnalytics
+except ImportError:
+    from models import db, Review, RoomRatingSummary, ReviewAnalytics
+
+
+def _rating_histograms(room_id=None):
+    """
+    Counts unflagged reviews per room and rating in the reviews table.
+
+    :param room_id: Only count this room's reviews, or None for every room.
+    :type room_id: int
+    :return: Room ID to a ``Counter`` of ratings.
+    :rtype: dict
+    """
+    query = db.session.query(
+        Review.room_id, Review.rating, func.count(Review.id)
+    ).filter(Review.is_flagged.is_(False))
+    if room_id is not None:
+        query = query.filter(Review.room_id == room_id)
+    per_room = {}
+    for room, rating, count in query.group_by(Review.room_id, Review.rating):
+        per_room.setdefault(room, Counter())[rating] += count
+    return per_room
+
+def _build_totals(model, histogram, **key):
+    """
+    Builds a rating totals row from a histogram of ratings.
+
+    :param model: RoomRatingSummary or ReviewAnalytics.
+    :param histogram: Rating to number of unflagged reviews.
+    :type histogram: collections.Counter
+    :param key: Primary key of the row, e.g. ``room_id=3``.
+    """
+    count = sum(histogram.values())
+    total = sum(rating * n for rating, n in histogram.items())
+    return model(
+        review_count=count,
+        rating_sum=total,
+        average_rating=total / count if count else None,
+        **{f'rating_{rating}': histogram.get(rating, 0) for rating in range(1, 6)},
+        **key
+    )
+
+def _update_totals(model, key, count_delta, sum_delta, bucket_deltas):
+    """
+    Applies relative deltas to one row of a rating totals table, creating it if needed.
+
+    The update is relative (``count = count + delta``) so concurrent writers
+    do not overwrite each other. A missing row is built from the reviews
+    table instead, which already holds the caller's change. Reviews written
+    before the row existed are then counted too, and removing one of them
+    cannot leave negative totals.
+
+    :param model: RoomRatingSummary or ReviewAnalytics.
+    :param key: Primary key column and value of the row, e.g. ``{'room_id': 3}``.
+    :type key: dict
+    :param count_delta: Change in the number of unflagged reviews.
+    :type count_delta: int
+    :param sum_delta: Change in the sum of unflagged ratings.
+    :type sum_delta: int
+    :param bucket_deltas: Change per histogram column, e.g. ``{'rating_4': 1}``.
+    :type bucket_deltas: dict
+    """
+    def update_row():
+        new_count = model.review_count + count_delta
+        new_sum = model.rating_sum + sum_delta
+        values = {
+            'review_count': new_count,
+            'rating_sum': new_sum,
+            'average_rating': case((new_count > 0, cast(new_sum, Float) / new_count), else_=None)
+        }
+        for column, delta in bucket_deltas.items():
+            values[column] = getattr(model, column) + delta
+        return model.query.filter_by(**key).update(values, synchronize_session=False)
+
+    if update_row():
+        return
+    histograms = _rating_histograms(key.get('room_id'))
+    histogram = histograms.get(key['room_id'], Counter()) if 'room_id' in key else sum(histograms.values(), Counter())
+    try:
+        with db.session.begin_nested():
+            db.session.add(_build_totals(model, histogram, **key))
+    except IntegrityError:
+        # Another request created the row first, without seeing this change
+        update_row()
+
+def apply_rating_change(room_id, added=(), removed=()):
+    """
+    Updates the room and global rating totals inside the current transaction.
+
+    Callers make the change to the reviews first, then pass the ratings of
+    reviews that start counting (submitted) and stop counting (deleted or
+    flagged). An edited rating is one of each.
+
+    :param room_id: ID of the reviewed room.
+    :type room_id: int
+    :param added: Ratings of unflagged reviews being added.
+    :type added: list
+    :param removed: Ratings of unflagged reviews being removed.
+    :type removed: list
+    """
+    buckets = Counter(added)
+    buckets.subtract(removed)
+    bucket_deltas = {f'rating_{rating}': delta for rating, delta in buckets.items() if delta}
+    count_delta = len(added) - len(removed)
+    sum_delta = sum(added) - sum(removed)
+    if not count_delta and not sum_delta and not bucket_deltas:
+        return
+
+    # Always room row first, then the global row, to keep a stable lock order
+    _update_totals(RoomRatingSummary, {'room_id': room_id}, count_delta, sum_delta, bucket_deltas)
+    _update_totals(ReviewAnalytics, {'id': ReviewAnalytics.GLOBAL_ID}, count_delta, sum_delta, bucket_deltas)
+
+def reconcile_rating_totals():
+    """
+    Rebuilds the room and global rating totals from the reviews table.
+
+    Runs in one transaction. On Postgres the reviews table is locked in SHARE
+    mode while rebuilding, so no write can slip between the scan and the
+    rewrite.
+
+    :return: Number of room summaries written.
+    :rtype: int
+    """
+    if db.engine.dialect.name == 'postgresql':
+        db.session.execute(text('LOCK TABLE reviews IN SHARE MODE'))
+
+    per_room = _rating_histograms()
+    overall = sum(per_room.values(), Counter())
+
+    RoomRatingSummary.query.delete()
+    ReviewAnalytics.query.delete()
+    db.session.add_all(_build_totals(RoomRatingSummary, histogram, room_id=room_id)
+                       for room_id, histogram in per_room.items())
+    db.session.add(_build_totals(ReviewAnalytics, overall, id=ReviewAnalytics.GLOBAL_ID))
+    db.session.commit()
+    return len(per_room)
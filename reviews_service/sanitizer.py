@@ -0,0 +1,65 @@
+import os
+import re
+import threading
+from bleach.sanitizer import Cleaner
+
+MAX_COMMENT_LENGTH = int(os.environ.get('MAX_COMMENT_LENGTH', 5000))
+
+# Characters bleach may rewrite: markup, entities and the control characters
+# the HTML parser normalizes. Text without any of them comes out of
+# bleach.clean() unchanged, so it can skip the parse entirely.
+_NEEDS_CLEANING = re.compile(r'[<>&\x00-\x08\x0b-\x1f\x7f]')
+
+# html5lib parsers are not thread-safe, so each thread builds one Cleaner
+# (same settings as bleach.clean()) and reuses it for every comment.
+_local = threading.local()
+
+
+def _get_cleaner():
+    cleaner = getattr(_local, 'cleaner', None)
+    if cleaner is None:
+        cleaner = _local.cleaner = Cleaner()
+    return cleaner
+
+def sanitize_comment(comment):
+    """
+    Sanitizes a review comment, producing the same output as ``bleach.clean()``.
+
+    Plain text with no markup-significant characters is returned as is.
+
+    :param comment: The raw comment.
+    :type comment: str
+    :return: The sanitized comment, or None if there is no comment.
+    :rtype: str
+    """
+    if comment is None:
+        return None
+    if not _NEEDS_CLEANING.search(comment):
+        return comment
+    return _get_cleaner().clean(comment)
+
+def sanitize_comments(comments):
+    """
+    Sanitizes many comments at once, e.g. for bulk imports.
+
+    :param comments: Raw comments.
+    :type comments: iterable
+    :return: Sanitized comments in the same order.
+    :rtype: list
+    """
+    cleaner = _get_cleaner()
+    return [
+        comment if comment is None or not _NEEDS_CLEANING.search(comment) else cleaner.clean(comment)
+        for comment in comments
+    ]
+
+def comment_too_long(comment):
+    """
+    Checks a raw comment against ``MAX_COMMENT_LENGTH``.
+
+    :param comment: The raw comment.
+    :type comment: str
+    :return: True if the comment exceeds the limit.
+    :rtype: bool
+    """
+    return comment is not None and len(comment) > MAX_COMMENT_LENGTH
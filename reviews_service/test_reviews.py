@@ -1,10 +1,20 @@
+import logging
+from datetime import datetime, timezone
 import pytest
-from reviews_service.app import app, db, Review
+import bleach
+from reviews_service.app import app, db, Review, RoomRatingSummary, ReviewAnalytics, EVENT_HANDLERS, remove_room_reviews
+from common.events import DatabaseBus, consume_events, record_event
+from reviews_service.sanitizer import sanitize_comment, sanitize_comments, MAX_COMMENT_LENGTH
+from common.logger import SegmentedFileHandler, JsonLineFormatter
+from reviews_service.log_reader import AuditLogReader, list_segments, read_index
+from reviews_service.audit_archive import archive_segments
 
 @pytest.fixture
 def client():
     app.config['TESTING'] = True
     with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
         yield client
 
 @pytest.fixture
@@ -62,4 +72,278 @@ def test_delete_review(client, random_review):
     """Test API: Delete a review"""
     review_id = random_review
     response = client.delete(f'/reviews/{review_id}')
-    assert response.status_code == 200
\ No newline at end of file
+    assert response.status_code == 200
+
+
+def test_rating_summary_tracks_unflagged_reviews(client):
+    """Test API: The room rating summary follows submits, updates and flags"""
+    room_id = 7301
+    with app.app_context():
+        Review.query.filter_by(room_id=room_id).delete()
+        RoomRatingSummary.query.filter_by(room_id=room_id).delete()
+        db.session.commit()
+
+    for rating in (2, 4):
+        client.post('/reviews', json={"user_id": 5, "room_id": room_id, "rating": rating, "comment": "ok"})
+
+    with app.app_context():
+        summary = db.session.get(RoomRatingSummary, room_id)
+        assert (summary.review_count, summary.rating_sum, summary.average_rating) == (2, 6, 3.0)
+        first, second = [r.id for r in Review.query.filter_by(room_id=room_id).order_by(Review.id)]
+
+    client.put(f'/reviews/{first}', json={"rating": 5})
+    client.post(f'/reviews/moderate/{second}', json={"action": "flag"}, headers={'X-User-Role': 'moderator'})
+
+    with app.app_context():
+        summary = db.session.get(RoomRatingSummary, room_id)
+        assert (summary.review_count, summary.rating_sum, summary.average_rating) == (1, 5, 5.0)
+
+def test_rating_summary_backfills_older_reviews(client):
+    """Test API: Removing a review written before the room had a summary never leaves negative totals"""
+    room_id = 7303
+    with app.app_context():
+        Review.query.filter_by(room_id=room_id).delete()
+        db.session.add_all(Review(user_id=5, room_id=room_id, rating=rating, comment="old") for rating in (3, 4, 5))
+        RoomRatingSummary.query.filter_by(room_id=room_id).delete()
+        db.session.commit()
+        oldest = Review.query.filter_by(room_id=room_id, rating=3).first().id
+
+    assert client.delete(f'/reviews/{oldest}').status_code == 200
+
+    with app.app_context():
+        summary = db.session.get(RoomRatingSummary, room_id)
+        assert (summary.review_count, summary.rating_sum, summary.average_rating) == (2, 9, 4.5)
+
+def test_room_analytics_and_reconcile(client):
+    """Test API: Running analytics match a full rebuild"""
+    room_id = 7302
+    with app.app_context():
+        Review.query.filter_by(room_id=room_id).delete()
+        db.session.commit()
+
+    runner = app.test_cli_runner()
+    assert runner.invoke(args=['reconcile-ratings']).exit_code == 0
+
+    for rating in (3, 5, 5):
+        client.post('/reviews', json={"user_id": 6, "room_id": room_id, "rating": rating, "comment": "fine"})
+
+    response = client.get(f'/api/v1/analytics/room/{room_id}')
+    assert response.status_code == 200
+    assert response.json['review_count'] == 3
+    assert response.json['histogram'] == {"1": 0, "2": 0, "3": 1, "4": 0, "5": 2}
+    global_before = client.get('/api/v1/analytics').json
+
+    assert runner.invoke(args=['reconcile-ratings']).exit_code == 0
+
+    assert client.get(f'/api/v1/analytics/room/{room_id}').json == response.json
+    assert client.get('/api/v1/analytics').json == global_before
+
+    unreviewed = client.get('/api/v1/analytics/room/7399').json
+    assert (unreviewed['review_count'], unreviewed['rating_sum'], unreviewed['average_rating']) == (0, 0, None)
+    assert unreviewed['histogram'] == {"1": 0, "2": 0, "3": 0, "4": 0, "5": 0}
+
+def test_room_reviews_pagination(client):
+    """Test API: Room reviews are paged newest first with a cursor"""
+    room_id = 7303
+    with app.app_context():
+        Review.query.filter_by(room_id=room_id).delete()
+        db.session.commit()
+
+    for rating in (1, 2, 3, 4, 5):
+        client.post('/reviews', json={"user_id": 7, "room_id": room_id, "rating": rating, "comment": f"r{rating}"})
+
+    first = client.get(f'/reviews/room/{room_id}?limit=3')
+    assert [r['rating'] for r in first.json] == [5, 4, 3]
+    cursor = first.headers['X-Next-Cursor']
+
+    second = client.get(f'/reviews/room/{room_id}?limit=3&cursor={cursor}')
+    assert [r['rating'] for r in second.json] == [2, 1]
+    assert 'X-Next-Cursor' not in second.headers
+
+    assert client.get(f'/reviews/room/{room_id}?cursor=garbage').status_code == 400
+
+def test_reviews_batch_by_room(client):
+    """Test API: Newest reviews of several rooms in one call"""
+    with app.app_context():
+        Review.query.filter(Review.room_id.in_([7304, 7305])).delete()
+        db.session.commit()
+
+    for room_id, rating in ((7304, 3), (7304, 4), (7305, 2)):
+        client.post('/reviews', json={"user_id": 8, "room_id": room_id, "rating": rating, "comment": "batch"})
+
+    response = client.get('/reviews?room_ids=7304,7305,7306&limit=1')
+    assert response.status_code == 200
+    assert [r['rating'] for r in response.json['7304']] == [4]
+    assert [r['rating'] for r in response.json['7305']] == [2]
+    assert response.json['7306'] == []
+
+def test_sanitizer_matches_bleach():
+    """Fast path and batch mode produce the same output as bleach.clean"""
+    comments = ["Plain text, no markup", "a > b & c", "<b>bold</b>", "line\r\nbreak", None]
+    expected = [bleach.clean(c) if c is not None else None for c in comments]
+    assert [sanitize_comment(c) for c in comments] == expected
+    assert sanitize_comments(comments) == expected
+
+def test_comment_length_limit(client):
+    """Test API: Oversized comments are rejected"""
+    data = {"user_id": 3, "room_id": 103, "rating": 3, "comment": "x" * (MAX_COMMENT_LENGTH + 1)}
+    response = client.post('/reviews', json=data)
+    assert response.status_code == 400
+
+def test_audit_logs_tail_filters_and_cursor(client, tmp_path, monkeypatch):
+    """Test API: Audit logs support tail, filters and cursors across segments"""
+    log_path = tmp_path / "audit.log"
+    log_path.write_text(
+        "2030-01-01 10:00:00,000 - INFO - Review Submitted: first\n"
+        "2030-01-01 11:00:00,000 - WARNING - Review deleted: second\n"
+    )
+    handler = SegmentedFileHandler(str(log_path), max_bytes=10**6, index_interval=1)
+    handler.setFormatter(JsonLineFormatter())
+    for created, message, event in ((1893495600, "third", "review.submitted"),
+                                    (1893499200, "fourth", "booking.created")):
+        record = logging.makeLogRecord({'msg': message, 'levelname': 'INFO', 'created': created,
+                                        'event': event, 'actor': 7})
+        handler.emit(record)
+    handler.close()
+    with open(f"{log_path}.000001", "a") as segment:
+        segment.write('{"partial line still being writ')
+    monkeypatch.setattr('reviews_service.app.AUDIT_LOG_PATH', str(log_path))
+
+    response = client.get('/reviews/logs?tail=3')
+    assert response.status_code == 200
+    assert [entry['message'].split(': ')[-1] for entry in response.json['logs']] == ['second', 'third', 'fourth']
+
+    response = client.get('/reviews/logs?level=warning')
+    assert [entry['message'] for entry in response.json['logs']] == ['Review deleted: second']
+
+    response = client.get('/reviews/logs?event=booking.created&actor=7')
+    assert [entry['message'] for entry in response.json['logs']] == ['fourth']
+
+    response = client.get('/reviews/logs?since=2030-01-01T10:30:00&until=2030-01-01T12:00:00')
+    assert [entry['message'] for entry in response.json['logs']] == ['Review deleted: second', 'third']
+
+    first_page = client.get('/reviews/logs?limit=1').json
+    second_page = client.get(f"/reviews/logs?limit=5&cursor={first_page['next_cursor']}").json
+    assert 'first' in first_page['logs'][0]['message']
+    assert len(second_page['logs']) == 3
+    complete_lines = (tmp_path / "audit.log.000001").read_bytes().rsplit(b"\n", 1)[0]
+    assert second_page['next_cursor'] == f"1:{len(complete_lines) + 1}"
+
+def test_audit_log_rotation_and_index(tmp_path):
+    """Test: Segments rotate by size and are indexed by time"""
+    handler = SegmentedFileHandler(str(tmp_path / "audit.log"), max_bytes=200, index_interval=100)
+    handler.setFormatter(JsonLineFormatter())
+    for second in range(6):
+        handler.emit(logging.makeLogRecord({'msg': f"entry {second}", 'levelname': 'INFO', 'created': 1893456000 + second}))
+    handler.close()
+
+    assert list_segments(str(tmp_path / "audit.log")) == [1, 2, 3]
+    index = read_index(1, str(tmp_path / "audit.log"))
+    assert index[0] == (1893456000.0, 0)
+
+    since = datetime(2030, 1, 1, 0, 0, 4, tzinfo=timezone.utc)
+    reader = AuditLogReader.from_time(since, str(tmp_path / "audit.log"))
+    assert [entry['message'] for entry in reader.entries(10, since=since)] == ['entry 4', 'entry 5']
+
+def test_bulk_moderation(client):
+    """Test API: Flag a spam wave in one call"""
+    room_id = 7307
+    with app.app_context():
+        Review.query.filter_by(room_id=room_id).delete()
+        RoomRatingSummary.query.filter_by(room_id=room_id).delete()
+        db.session.commit()
+
+    for comment in ("BUY NOW cheap", "buy now!!", "Lovely room"):
+        client.post('/reviews', json={"user_id": 9, "room_id": room_id, "rating": 1, "comment": comment})
+
+    payload = {"action": "flag", "filter": {"room_id": room_id, "comment_contains": "buy now"}, "reason": "spam"}
+    response = client.post('/reviews/moderate/bulk', json=payload, headers={'X-User-Role': 'moderator'})
+    assert response.status_code == 200
+    assert response.json['flagged'] == 2
+
+    visible = client.get(f'/reviews/room/{room_id}').json
+    assert [r['comment'] for r in visible] == ["Lovely room"]
+    assert client.get(f'/api/v1/analytics/room/{room_id}').json['review_count'] == 1
+
+    response = client.post('/reviews/moderate/bulk', json={"action": "flag"}, headers={'X-User-Role': 'admin'})
+    assert response.status_code == 400
+    for invalid in (["room_id"], {"room_id": "7307"}, {"user_id": [9]}, {"comment_contains": 5}):
+        response = client.post('/reviews/moderate/bulk', json={"action": "flag", "filter": invalid},
+                               headers={'X-User-Role': 'admin'})
+        assert response.status_code == 400
+    for invalid in ([True], [1, False], ["1"], []):
+        response = client.post('/reviews/moderate/bulk', json={"action": "flag", "ids": invalid},
+                               headers={'X-User-Role': 'admin'})
+        assert response.status_code == 400
+
+def test_search_reviews(client):
+    """Test API: Search review comments across rooms"""
+    client.post('/reviews', json={"user_id": 11, "room_id": 7308, "rating": 2, "comment": "The projector is broken again"})
+    client.post('/reviews', json={"user_id": 11, "room_id": 7309, "rating": 4, "comment": "Projector works great"})
+
+    response = client.get('/reviews/search?q=broken projector')
+    assert response.status_code == 200
+    comments = [r['comment'] for r in response.json['results']]
+    assert "The projector is broken again" in comments
+    assert "Projector works great" not in comments
+
+    assert client.get('/reviews/search').status_code == 400
+
+def test_audit_log_archive_and_search(client, tmp_path, monkeypatch):
+    """Test: Closed segments are compressed and still searchable"""
+    log_path = str(tmp_path / "audit.log")
+    handler = SegmentedFileHandler(log_path, max_bytes=200, index_interval=100)
+    handler.setFormatter(JsonLineFormatter())
+    for second in range(6):
+        handler.emit(logging.makeLogRecord({'msg': f"entry {second}", 'levelname': 'INFO',
+                                            'created': 1893456000 + second, 'event': f"event.{second % 2}"}))
+    handler.close()
+
+    assert archive_segments(log_path) == [1, 2]
+    assert archive_segments(log_path) == []
+    assert sorted(path.name for path in tmp_path.iterdir() if path.suffix == '.gz') == ['audit.log.000001.gz', 'audit.log.000002.gz']
+    assert list_segments(log_path) == [1, 2, 3]
+    monkeypatch.setattr('reviews_service.app.AUDIT_LOG_PATH', log_path)
+
+    response = client.get('/reviews/logs?event=event.1')
+    assert [entry['message'] for entry in response.json['logs']] == ['entry 1', 'entry 3', 'entry 5']
+
+    response = client.get('/reviews/logs?since=2030-01-01T00:00:02&until=2030-01-01T00:00:04')
+    assert [entry['message'] for entry in response.json['logs']] == ['entry 2', 'entry 3']
+
+    response = client.get('/reviews/logs?tail=3')
+    assert [entry['message'] for entry in response.json['logs']] == ['entry 3', 'entry 4', 'entry 5']
+
+def test_room_deleted_event_removes_reviews(client):
+    """Test events: A room.deleted event removes the room's reviews and rating summary"""
+    room_id = 7310
+    with app.app_context():
+        Review.query.filter_by(room_id=room_id).delete()
+        RoomRatingSummary.query.filter_by(room_id=room_id).delete()
+        db.session.commit()
+
+    for rating in (4, 2):
+        client.post('/reviews', json={"user_id": 8, "room_id": room_id, "rating": rating, "comment": "ok"})
+    with app.app_context():
+        flagged = Review.query.filter_by(room_id=room_id, rating=2).first().id
+    client.post(f'/reviews/moderate/{flagged}', json={"action": "flag"}, headers={'X-User-Role': 'moderator'})
+
+    with app.app_context():
+        app.extensions['event_bus'] = DatabaseBus(db.engine)
+        try:
+            before = db.session.get(ReviewAnalytics, ReviewAnalytics.GLOBAL_ID).totals_dict()
+            record_event('room.deleted', {'id': room_id})
+            db.session.commit()
+            assert consume_events(EVENT_HANDLERS, group='reviews_test', once=True) >= 1
+
+            assert Review.query.filter_by(room_id=room_id).count() == 0
+            assert db.session.get(RoomRatingSummary, room_id) is None
+            after = db.session.get(ReviewAnalytics, ReviewAnalytics.GLOBAL_ID).totals_dict()
+            assert (after['review_count'], after['rating_sum']) == (before['review_count'] - 1, before['rating_sum'] - 4)
+
+            # Delivered again, the event changes nothing
+            remove_room_reviews({'type': 'room.deleted', 'source': 'rooms_service', 'data': {'id': room_id}})
+            db.session.commit()
+            assert db.session.get(ReviewAnalytics, ReviewAnalytics.GLOBAL_ID).totals_dict() == after
+        finally:
+            app.extensions.pop('event_bus')
@@ -1,4 +1,5 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import table, column
 
 db = SQLAlchemy()
 
@@ -37,4 +38,33 @@ class Room(db.Model):
             "capacity": self.capacity,
             "equipment": self.equipment,
             "location": self.location
-        }
\ No newline at end of file
+        }
+
+    @classmethod
+    def columns(cls):
+        """
+        Columns returned by :meth:`to_dict`, for listings that select column tuples.
+
+        :return: The mapped columns, in ``to_dict()`` order.
+        :rtype: tuple
+        """
+        return (cls.id, cls.name, cls.capacity, cls.equipment, cls.location)
+
+# Read-only view of the bookings table owned by the bookings service. It is a
+# lightweight table() so db.create_all() in this service never touches it.
+bookings = table(
+    'bookings',
+    column('room_id', db.Integer),
+    column('start_time', db.DateTime),
+    column('end_time', db.DateTime)
+)
+
+
+# Read-only view of the per-room rating summaries maintained by the reviews
+# service.
+room_rating_summaries = table(
+    'room_rating_summaries',
+    column('room_id', db.Integer),
+    column('review_count', db.Integer),
+    column('average_rating', db.Float)
+)
@@ -0,0 +1,4 @@
+from common.serve import serve
+
+if __name__ == '__main__':
+    serve('rooms_service.app', 5002)
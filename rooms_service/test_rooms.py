@@ -1,5 +1,7 @@
 import pytest
-from rooms_service.app import app, db, Room
+from datetime import datetime
+from sqlalchemy import func, text
+from rooms_service.app import app, db, Room, bookings
 
 @pytest.fixture
 def client():
@@ -82,4 +84,150 @@ def test_delete_room(client):
     assert response.status_code == 200
     
     with app.app_context():
-        assert Room.query.get(room_id) is None
\ No newline at end of file
+        assert Room.query.get(room_id) is None
+
+def test_get_available_rooms(client):
+    """Test API: Search free rooms for a time window"""
+    room_data = {
+        "name": "Test Room E",
+        "capacity": 12,
+        "equipment": "Projector",
+        "location": "Building 5"
+    }
+    cleanup_room("Test Room E")
+    create_resp = client.post('/rooms', json=room_data, headers={'X-User-Role': 'admin'})
+    room_id = create_resp.json['room']['id']
+
+    window = "start_time=2031-03-01T14:00:00&end_time=2031-03-01T15:00:00"
+    response = client.get(f'/rooms/available?capacity=10&equipment=projector&{window}')
+    assert response.status_code == 200
+    assert room_id in [r['id'] for r in response.json]
+
+    with app.app_context():
+        db.session.execute(
+            text("INSERT INTO bookings (user_id, room_id, start_time, end_time) "
+                 "VALUES (1, :room_id, :start, :end)"),
+            {"room_id": room_id, "start": datetime(2031, 3, 1, 14, 30), "end": datetime(2031, 3, 1, 15, 30)}
+        )
+        db.session.commit()
+
+    response = client.get(f'/rooms/available?capacity=10&equipment=projector&{window}')
+    assert room_id not in [r['id'] for r in response.json]
+
+    with app.app_context():
+        db.session.execute(bookings.delete().where(bookings.c.room_id == room_id))
+        db.session.commit()
+
+def test_get_available_rooms_requires_window(client):
+    """Test API: Availability search rejects a missing time window"""
+    response = client.get('/rooms/available?capacity=10')
+    assert response.status_code == 400
+
+def test_bulk_create_and_upsert_rooms(client):
+    """Test API: Bulk create then upsert rooms with per-row results"""
+    admin = {'X-User-Role': 'admin'}
+    for name in ("Bulk Room 1", "Bulk Room 2", "Bulk Room 3"):
+        cleanup_room(name)
+
+    payload = {"rooms": [
+        {"name": "Bulk Room 1", "capacity": 6, "equipment": "TV", "location": "Building 6"},
+        {"name": "Bulk Room 2", "capacity": 8, "equipment": None, "location": "Building 6"},
+        {"name": "Bad Room", "capacity": -1, "location": "Building 6"}
+    ]}
+    response = client.post('/rooms/bulk', json=payload, headers=admin)
+    assert response.status_code == 207
+    assert response.json['created'] == 2
+    assert response.json['results'][2]['status'] == 'error'
+    first_id = response.json['results'][0]['id']
+
+    upsert = {"rooms": [
+        {"id": first_id, "capacity": 16},
+        {"name": "Bulk Room 3", "capacity": 4, "location": "Building 6"}
+    ]}
+    response = client.put('/rooms/bulk', json=upsert, headers=admin)
+    assert response.status_code == 200
+    assert [r['status'] for r in response.json['results']] == ['updated', 'created']
+
+    with app.app_context():
+        assert db.session.get(Room, first_id).capacity == 16
+
+    response = client.put('/rooms/bulk', json={"rooms": [{"id": [first_id], "capacity": 2}, {"id": first_id, "capacity": 12}]},
+                          headers=admin)
+    assert response.status_code == 207
+    assert "id must be an integer" in response.json["results"][0]["errors"]
+    assert response.json['results'][1]['status'] == 'updated'
+
+    # An unknown id is an error, not a new room; true is not room 1
+    with app.app_context():
+        missing_id = (db.session.query(func.max(Room.id)).scalar() or 0) + 1000
+    response = client.put('/rooms/bulk', json={"rooms": [
+        {"id": missing_id, "name": "Bulk Room 4", "capacity": 4, "location": "Building 6"},
+        {"id": True, "capacity": 3}
+    ]}, headers=admin)
+    assert response.status_code == 207
+    assert response.json['results'][0]['errors'] == ["Room not found"]
+    assert response.json['results'][1]['errors'] == ["id must be an integer"]
+    with app.app_context():
+        assert Room.query.filter_by(name="Bulk Room 4").first() is None
+
+def test_bulk_rooms_atomic_rejects_batch(client):
+    """Test API: An atomic bulk update writes nothing when a row fails"""
+    payload = {"atomic": True, "rooms": [
+        {"name": "Atomic Room", "capacity": 3, "location": "Building 7"},
+        {"name": "Atomic Room", "capacity": "many", "location": "Building 7"}
+    ]}
+    response = client.post('/rooms/bulk', json=payload, headers={'X-User-Role': 'admin'})
+    assert response.status_code == 400
+
+    with app.app_context():
+        assert Room.query.filter_by(name="Atomic Room").first() is None
+
+def test_get_rooms_conditional(client):
+    """Test API: Room listings support ETag revalidation"""
+    cleanup_room("Test Room F")
+    response = client.get('/rooms?location=Building 8')
+    etag = response.headers['ETag']
+    assert 'max-age' in response.headers['Cache-Control']
+
+    response = client.get('/rooms?location=Building 8', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+
+    room_data = {"name": "Test Room F", "capacity": 4, "equipment": "None", "location": "Building 8"}
+    client.post('/rooms', json=room_data, headers={'X-User-Role': 'admin'})
+
+    response = client.get('/rooms?location=Building 8', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert "Test Room F" in [r['name'] for r in response.json]
+
+def test_get_rooms_sorted_by_rating(client):
+    """Test API: Sort and filter rooms by their rating summary"""
+    admin = {'X-User-Role': 'admin'}
+    ids = []
+    for name in ("Rated Room Low", "Rated Room High"):
+        cleanup_room(name)
+        room_data = {"name": name, "capacity": 3, "equipment": "None", "location": "Building 9"}
+        ids.append(client.post('/rooms', json=room_data, headers=admin).json['room']['id'])
+
+    with app.app_context():
+        for room_id, count, average in zip(ids, (2, 4), (2.5, 4.75)):
+            db.session.execute(
+                text("INSERT INTO room_rating_summaries (room_id, review_count, rating_sum, average_rating) "
+                     "VALUES (:room_id, :count, :total, :average)"),
+                {"room_id": room_id, "count": count, "total": count * average, "average": average}
+            )
+        db.session.commit()
+
+    response = client.get('/rooms?location=Building 9&sort=rating')
+    assert response.status_code == 200
+    assert [r['id'] for r in response.json][:2] == [ids[1], ids[0]]
+    assert response.json[0]['average_rating'] == 4.75
+
+    response = client.get('/rooms?location=Building 9&min_rating=4')
+    assert [r['id'] for r in response.json] == [ids[1]]
+
+    with app.app_context():
+        db.session.execute(
+            text("DELETE FROM room_rating_summaries WHERE room_id IN (:low, :high)"),
+            {"low": ids[0], "high": ids[1]}
+        )
+        db.session.commit()
@@ -0,0 +1,4 @@
+from common.serve import serve
+
+if __name__ == '__main__':
+    serve('users_service.app', 5001)
@@ -0,0 +1,247 @@
+import logging
+import os
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+SERVICE_CONNECT_TIMEOUT = float(os.environ.get('SERVICE_CONNECT_TIMEOUT', 1.0))
+SERVICE_READ_TIMEOUT = float(os.environ.get('SERVICE_READ_TIMEOUT', 5.0))
+# Extra attempts after the first one, for idempotent requests only
+SERVICE_RETRIES = int(os.environ.get('SERVICE_RETRIES', 2))
+SERVICE_BACKOFF = float(os.environ.get('SERVICE_BACKOFF', 0.1))
+SERVICE_POOL_SIZE = int(os.environ.get('SERVICE_POOL_SIZE', 10))
+BREAKER_FAILURES = int(os.environ.get('SERVICE_BREAKER_FAILURES', 5))
+BREAKER_RESET_SECONDS = float(os.environ.get('SERVICE_BREAKER_RESET_SECONDS', 30))
+
+RETRY_STATUSES = frozenset({502, 503, 504})
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS'})
+
+client_logger = logging.getLogger('service_client')
+
+
+class ServiceUnavailable(Exception):
+    """
+    Raised when a service cannot be reached: the circuit is open, or every
+    attempt failed with a request error such as a connection error, a
+    timeout or a truncated response.
+
+    :param service: Name of the service.
+    :type service: str
+    :param reason: What went wrong.
+    :type reason: str
+    """
+
+    def __init__(self, service, reason):
+        super().__init__(f"{service} unavailable: {reason}")
+        self.service = service
+        self.reason = reason
+
+class CircuitBreaker:
+    """
+    Stops calling a service after repeated failures.
+
+    After ``failures`` consecutive failures the circuit opens and calls fail
+    immediately. Once ``reset_seconds`` have passed one trial call is let
+    through (half-open): success closes the circuit, failure opens it again.
+
+    :param failures: Consecutive failures that open the circuit.
+    :type failures: int
+    :param reset_seconds: Seconds the circuit stays open before a trial call.
+    :type reset_seconds: float
+    """
+
+    def __init__(self, failures=BREAKER_FAILURES, reset_seconds=BREAKER_RESET_SECONDS):
+        self.failures = failures
+        self.reset_seconds = reset_seconds
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        """
+        ``closed``, ``open`` or ``half-open``.
+
+        :rtype: str
+        """
+        with self.lock:
+            if self.opened_at is None:
+                return 'closed'
+            if time.monotonic() - self.opened_at >= self.reset_seconds:
+                return 'half-open'
+            return 'open'
+
+    def allow(self):
+        """
+        Tells whether a call may go through now.
+
+        :rtype: bool
+        """
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_seconds or self.trial_in_flight:
+                return False
+            self.trial_in_flight = True
+            return True
+
+    def record_success(self):
+        with self.lock:
+            self.consecutive_failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        """
+        Counts a failed call.
+
+        :return: True if this failure opened the circuit.
+        :rtype: bool
+        """
+        with self.lock:
+            self.consecutive_failures += 1
+            reopened = self.trial_in_flight
+            self.trial_in_flight = False
+            if reopened or (self.opened_at is None and self.consecutive_failures >= self.failures):
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+class _InFlight:
+    """A GET being sent, whose result is shared with identical GETs that arrive meanwhile."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+class ServiceClient:
+    """
+    HTTP client for calls to another service.
+
+    - One ``requests.Session`` keeps up to ``pool_size`` keep-alive
+      connections per host.
+    - Every attempt has a connect and a read timeout.
+    - Idempotent requests are retried up to ``retries`` times on request
+      errors (connection errors, timeouts, broken responses) and 502/503/504, sleeping a random time up to
+      ``backoff * 2 ** attempt`` (full jitter) in between.
+    - A :class:`CircuitBreaker` fails calls fast while the service is down.
+    - Identical GETs in flight at the same time share one upstream request.
+
+    Request errors that outlast the retries, and calls made while the
+    circuit is open, raise :class:`ServiceUnavailable`. Other
+    responses, including 5xx ones, are returned to the caller.
+
+    :param name: Service name, used in errors and logs.
+    :type name: str
+    :param connect_timeout: Seconds to establish a connection.
+    :type connect_timeout: float
+    :param read_timeout: Seconds to wait for the response.
+    :type read_timeout: float
+    :param retries: Extra attempts for idempotent requests.
+    :type retries: int
+    :param backoff: Base delay between attempts, in seconds.
+    :type backoff: float
+    :param pool_size: Keep-alive connections kept per host.
+    :type pool_size: int
+    :param breaker: Circuit breaker, a new one by default.
+    :type breaker: CircuitBreaker
+    """
+
+    def __init__(self, name, connect_timeout=SERVICE_CONNECT_TIMEOUT, read_timeout=SERVICE_READ_TIMEOUT,
+                 retries=SERVICE_RETRIES, backoff=SERVICE_BACKOFF, pool_size=SERVICE_POOL_SIZE, breaker=None):
+        self.name = name
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.in_flight = {}
+        self.lock = threading.Lock()
+
+    def get(self, url, params=None, headers=None):
+        """
+        Sends a GET, sharing the response with identical concurrent GETs.
+
+        Requests are identical when their URL, parameters and headers match.
+        Callers that join an in-flight request get the same response object
+        (or exception).
+
+        :param url: Full URL.
+        :type url: str
+        :param params: Query parameters.
+        :type params: dict
+        :param headers: Request headers.
+        :type headers: dict
+        :return: The response.
+        :rtype: requests.Response
+        :raises ServiceUnavailable: If the service could not be reached.
+        """
+        key = (url, tuple(sorted((params or {}).items())), tuple(sorted((headers or {}).items())))
+        with self.lock:
+            pending = self.in_flight.get(key)
+            leader = pending is None
+            if leader:
+                pending = self.in_flight[key] = _InFlight()
+
+        if not leader:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.response
+
+        try:
+            pending.response = self.request('GET', url, params=params, headers=headers)
+            return pending.response
+        except Exception as error:
+            pending.error = error
+            raise
+        finally:
+            with self.lock:
+                del self.in_flight[key]
+            pending.done.set()
+
+    def request(self, method, url, **kwargs):
+        """
+        Sends a request with timeouts, retries and the circuit breaker.
+
+        :param method: HTTP method.
+        :type method: str
+        :param url: Full URL.
+        :type url: str
+        :param kwargs: Passed to ``requests.Session.request``.
+        :return: The response.
+        :rtype: requests.Response
+        :raises ServiceUnavailable: If the circuit is open or every attempt failed with a request error.
+        """
+        attempts = 1 + (self.retries if method.upper() in IDEMPOTENT_METHODS else 0)
+        kwargs.setdefault('timeout', self.timeout)
+        for attempt in range(attempts):
+            if not self.breaker.allow():
+                raise ServiceUnavailable(self.name, 'circuit open')
+            failure, response = 'unexpected error', None
+            try:
+                response = self.session.request(method, url, **kwargs)
+                failure = f"HTTP {response.status_code}" if response.status_code in RETRY_STATUSES else None
+            except requests.RequestException as error:
+                failure, response = error, None
+            finally:
+                # Also runs when something else is raised, so a half-open trial always ends
+                if failure is None:
+                    self.breaker.record_success()
+                elif self.breaker.record_failure():
+                    client_logger.warning("Circuit to %s opened after %s", self.name, failure)
+            if failure is None:
+                return response
+            if attempt + 1 < attempts:
+                time.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+        if response is not None:
+            return response
+        raise ServiceUnavailable(self.name, str(failure))
@@ -1,11 +1,18 @@
+import threading
+import time
 import pytest
+import requests
+from requests.adapters import BaseAdapter
 from app import app, db, User
 from crypto_utils import decrypt_data
+from service_client import CircuitBreaker, ServiceClient, ServiceUnavailable
 
 @pytest.fixture
 def client():
     app.config['TESTING'] = True
     with app.test_client() as client:
+        with app.app_context():
+            db.create_all()
         yield client
 
 def get_test_user_data():
@@ -92,4 +99,97 @@ def test_delete_user(client):
     assert response.status_code ==200
 
     get_resp = client.get(f'/users/{user_data["username"]}')
-    assert get_resp.status_code == 404
\ No newline at end of file
+    assert get_resp.status_code == 404
+
+
+class FakeAdapter(BaseAdapter):
+    """Answers with the given statuses or raises the given errors, in order."""
+
+    def __init__(self, outcomes, gate=None):
+        super().__init__()
+        self.outcomes = list(outcomes)
+        self.gate = gate
+        self.entered = threading.Event()
+        self.calls = 0
+
+    def send(self, request, **kwargs):
+        self.calls += 1
+        self.entered.set()
+        if self.gate:
+            self.gate.wait(5)
+        outcome = self.outcomes.pop(0) if len(self.outcomes) > 1 else self.outcomes[0]
+        if isinstance(outcome, Exception):
+            raise outcome
+        response = requests.Response()
+        response.status_code = outcome
+        response._content = b'[]'
+        response.request = request
+        return response
+
+    def close(self):
+        pass
+
+def test_service_client_retries_breaker_and_coalescing():
+    """Test Client: Retries, circuit breaker and GET coalescing"""
+    service = ServiceClient('bookings', retries=2, backoff=0)
+    adapter = FakeAdapter([requests.ConnectionError(), 503, 200])
+    service.session.mount('http://bookings/', adapter)
+    assert service.get('http://bookings/bookings').status_code == 200
+    assert adapter.calls == 3
+
+    adapter = FakeAdapter([503])
+    service.session.mount('http://bookings/', adapter)
+    assert service.request('POST', 'http://bookings/bookings').status_code == 503
+    assert adapter.calls == 1
+
+    breaker = CircuitBreaker(failures=2, reset_seconds=60)
+    service = ServiceClient('bookings', retries=0, breaker=breaker)
+    adapter = FakeAdapter([requests.Timeout()])
+    service.session.mount('http://bookings/', adapter)
+    for _ in range(3):
+        with pytest.raises(ServiceUnavailable):
+            service.get('http://bookings/bookings')
+    assert adapter.calls == 2 and breaker.state == 'open'
+    breaker.opened_at -= 60
+    service.session.mount('http://bookings/', FakeAdapter([200]))
+    assert service.get('http://bookings/bookings').status_code == 200
+    assert breaker.state == 'closed'
+
+    gate = threading.Event()
+    adapter = FakeAdapter([200], gate=gate)
+    service.session.mount('http://bookings/', adapter)
+    responses = []
+    threads = [threading.Thread(target=lambda: responses.append(service.get('http://bookings/bookings', params={'user_id': 1})))
+               for _ in range(5)]
+    threads[0].start()
+    adapter.entered.wait(5)
+    for thread in threads[1:]:
+        thread.start()
+    time.sleep(0.2)
+    gate.set()
+    for thread in threads:
+        thread.join()
+    assert adapter.calls == 1
+    assert len(responses) == 5 and all(response is responses[0] for response in responses)
+
+def test_service_client_ends_trial_on_any_error():
+    """Test Client: Other request errors and unexpected errors still settle the half-open trial"""
+    breaker = CircuitBreaker(failures=1, reset_seconds=60)
+    service = ServiceClient('bookings', retries=1, backoff=0, breaker=breaker)
+    adapter = FakeAdapter([requests.exceptions.ChunkedEncodingError(), 200])
+    service.session.mount('http://bookings/', adapter)
+    with pytest.raises(ServiceUnavailable):
+        service.get('http://bookings/bookings')
+    assert adapter.calls == 1 and breaker.state == 'open'
+
+    breaker.opened_at -= 60
+    adapter = FakeAdapter([RuntimeError('bug')])
+    service.session.mount('http://bookings/', adapter)
+    with pytest.raises(RuntimeError):
+        service.get('http://bookings/bookings')
+    assert not breaker.trial_in_flight and breaker.state == 'open'
+
+    breaker.opened_at -= 60
+    service.session.mount('http://bookings/', FakeAdapter([200]))
+    assert service.get('http://bookings/bookings').status_code == 200
+    assert breaker.state == 'closed'